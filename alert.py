@@ -19,4 +19,8 @@ class AlertRequestModel(BaseModel):
     filters: Optional[List[Filter]] = None
 
 class AlertListRequestModel(BaseModel):
-    alerts : List[AlertModel]
\ No newline at end of file
+    alerts : List[AlertModel]
+
+class AlertResolveRequestModel(BaseModel):
+    alertIds : List[str]
+    status : str = "resolved"
\ No newline at end of file
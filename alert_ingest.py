@@ -0,0 +1,218 @@
+import asyncio
+import datetime
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, List
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.alert import AlertModel
+from models.alert_record import AlertRecord
+from utils.alert_rollup import add_transition, apply_rollup_delta, lock_customer_rollup
+
+logger = logging.getLogger(__name__)
+
+ALERT_INGEST_CHUNK_SIZE = int(os.getenv("ALERT_INGEST_CHUNK_SIZE", "1000"))
+ALERT_INGEST_CONCURRENCY = int(os.getenv("ALERT_INGEST_CONCURRENCY", "4"))
+
+# Ingest never moves an alert back to this status; see _keep_status()
+OPEN_STATUS = "open"
+# Columns rewritten when an existing alert changed
+_UPDATE_COLUMNS = ("asset_external_id", "policy_name", "severity", "status", "alert_time", "payload",
+                   "content_hash", "updated_at")
+
+
+def _parse_time(value) -> datetime.datetime:
+    if isinstance(value, (int, float)):
+        return datetime.datetime.fromtimestamp(value / 1000, tz=datetime.timezone.utc)
+    if isinstance(value, str):
+        return datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def alert_row(customer_id: uuid.UUID, alert: AlertModel, now: int) -> Dict[str, Any]:
+    """Project an AlertModel onto the indexed alert columns; the full payload is kept as JSONB."""
+    payload = alert.model_dump(mode="json", by_alias=True)
+    content_hash = hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+    policy = payload.get("policy") or {}
+    resource = payload.get("resource") or {}
+    return {
+        "customer_id": customer_id,
+        "external_alert_id": str(payload["id"]),
+        "asset_external_id": resource.get("id") or payload.get("externalAssetId") or payload.get("assetId"),
+        "policy_name": policy.get("name") or payload.get("policyName"),
+        "severity": str(policy.get("severity") or payload.get("severity") or "unknown").lower(),
+        "status": str(payload.get("status") or OPEN_STATUS).lower(),
+        "alert_time": _parse_time(payload.get("alertTime") or payload.get("firstSeen")),
+        "payload": payload,
+        "content_hash": content_hash,
+        "updated_at": now,
+    }
+
+
+def _key(row) -> tuple:
+    return (row["asset_external_id"], row["severity"], row["status"])
+
+
+def _keep_status(row: Dict[str, Any], stored_status: str) -> Dict[str, Any]:
+    """A resend never reopens an alert: an "open" row keeps the stored status.
+
+    Statuses set through set_alert_status (e.g. resolved) therefore survive
+    later resends, changed or not; a resend with any other status still
+    applies it. content_hash stays the hash of what was sent, so an identical
+    resend is skipped as before.
+    """
+    if row["status"] != OPEN_STATUS or stored_status == OPEN_STATUS:
+        return row
+    return {**row, "status": stored_status, "payload": {**row["payload"], "status": stored_status}}
+
+
+async def ingest_chunk(db: AsyncSession, customer_id: uuid.UUID, rows: List[Dict[str, Any]]) -> Counter:
+    """Write one chunk of already-deduplicated rows in a single transaction.
+
+    Rollup deltas are taken from the writes themselves, never from a read of
+    rows that may not exist yet:
+    1. INSERT ... ON CONFLICT DO NOTHING RETURNING tells which alerts this
+       transaction created. A concurrent insert of the same alert makes it
+       wait and then conflict, so only one writer counts a new alert.
+    2. Every other alert now exists and is locked with SELECT ... FOR UPDATE.
+       The values it returns are the ones the upsert replaces.
+    Rows are handled in external id order so concurrent chunks lock them in
+    the same order.
+    """
+    counts = Counter()
+    rows = sorted(rows, key=lambda row: row["external_alert_id"])
+    by_id = {row["external_alert_id"]: row for row in rows}
+    await lock_customer_rollup(db, customer_id)
+
+    delta = Counter()
+    inserted = set((await db.execute(
+        insert(AlertRecord).values(rows)
+        .on_conflict_do_nothing(constraint="uq_alerts_customer_external_alert_id")
+        .returning(AlertRecord.external_alert_id)
+    )).scalars())
+    for external_alert_id in inserted:
+        add_transition(delta, None, _key(by_id[external_alert_id]))
+    counts["inserted"] = len(inserted)
+
+    remaining = [row["external_alert_id"] for row in rows if row["external_alert_id"] not in inserted]
+    changed = []
+    if remaining:
+        existing = await db.execute(
+            select(AlertRecord.external_alert_id, AlertRecord.asset_external_id, AlertRecord.severity,
+                   AlertRecord.status, AlertRecord.content_hash)
+            .where(AlertRecord.customer_id == customer_id, AlertRecord.external_alert_id.in_(remaining))
+            .order_by(AlertRecord.external_alert_id)
+            .with_for_update()
+        )
+        for old in existing:
+            row = by_id[old.external_alert_id]
+            if old.content_hash == row["content_hash"]:
+                counts["skipped"] += 1
+                continue
+            row = _keep_status(row, old.status)
+            add_transition(delta, (old.asset_external_id, old.severity, old.status), _key(row))
+            counts["updated"] += 1
+            changed.append(row)
+
+    if changed:
+        stmt = insert(AlertRecord).values(changed)
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_alerts_customer_external_alert_id",
+            set_={column: stmt.excluded[column] for column in _UPDATE_COLUMNS},
+        )
+        await db.execute(stmt)
+    await apply_rollup_delta(db, customer_id, delta)
+    await db.commit()
+    return counts
+
+
+async def ingest_alerts(customer_id: uuid.UUID, alerts: List[AlertModel], session_factory=None,
+                        chunk_size: int = ALERT_INGEST_CHUNK_SIZE,
+                        concurrency: int = ALERT_INGEST_CONCURRENCY) -> Dict[str, Any]:
+    """Idempotent bulk ingest: resending an overlapping window only writes what changed.
+
+    Alerts are deduplicated by external id within the request (last one
+    wins), split into chunks, and the chunks are written concurrently, each
+    on its own session, up to `concurrency` at a time. A resend never
+    reopens an alert whose status was changed (see _keep_status).
+
+    Each chunk commits on its own, so the batch is not atomic: when a chunk
+    fails, the others still run to completion and stay committed. Every
+    chunk's outcome is reported in "chunks", and the counts cover only
+    committed chunks. Because ingest is idempotent, resending the whole
+    batch is the way to retry; chunks that made it are skipped.
+    """
+    if session_factory is None:
+        from database import SessionLocal
+        session_factory = SessionLocal
+    now = int(time.time())
+    counts = Counter()
+    unique: Dict[str, Dict[str, Any]] = {}
+    for alert in alerts:
+        row = alert_row(customer_id, alert, now)
+        if row["external_alert_id"] in unique:
+            counts["skipped"] += 1
+        unique[row["external_alert_id"]] = row
+
+    rows = list(unique.values())
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(chunk):
+        async with semaphore:
+            async with session_factory() as db:
+                return await ingest_chunk(db, customer_id, chunk)
+
+    chunks = [rows[i:i + chunk_size] for i in range(0, len(rows), chunk_size)]
+    results = await asyncio.gather(*(run(chunk) for chunk in chunks), return_exceptions=True)
+    report = []
+    for index, (chunk, result) in enumerate(zip(chunks, results)):
+        if isinstance(result, BaseException):
+            logger.error("Alert ingest chunk %d for customer %s failed", index, customer_id, exc_info=result)
+            report.append({"chunk": index, "alerts": len(chunk), "status": "failed", "error": type(result).__name__})
+            continue
+        counts.update(result)
+        report.append({"chunk": index, "alerts": len(chunk), "status": "committed"})
+    return {
+        "inserted": counts["inserted"],
+        "updated": counts["updated"],
+        "skipped": counts["skipped"],
+        "failedChunks": sum(1 for chunk in report if chunk["status"] == "failed"),
+        "chunks": report,
+    }
+
+
+async def set_alert_status(db: AsyncSession, customer_id: uuid.UUID, alert_ids: List[str], status: str) -> int:
+    """Change the status of the given alerts (e.g. resolve them) in one statement.
+
+    The status column and the stored payload are updated together, so
+    searches filtered on status return matching JSON.
+    """
+    status = status.lower()
+    await lock_customer_rollup(db, customer_id)
+    old = (
+        select(AlertRecord.id, AlertRecord.status)
+        .where(AlertRecord.customer_id == customer_id, AlertRecord.external_alert_id.in_(alert_ids))
+        .with_for_update()
+        .subquery()
+    )
+    result = await db.execute(
+        update(AlertRecord)
+        .where(AlertRecord.id == old.c.id, old.c.status != status)
+        .values(status=status, payload=AlertRecord.payload.op("||")(func.jsonb_build_object("status", status)),
+                updated_at=int(time.time()))
+        .returning(AlertRecord.asset_external_id, AlertRecord.severity, old.c.status)
+    )
+    delta = Counter()
+    changed = 0
+    for asset_id, severity, previous_status in result:
+        add_transition(delta, (asset_id, severity, previous_status), (asset_id, severity, status))
+        changed += 1
+    await apply_rollup_delta(db, customer_id, delta)
+    await db.commit()
+    return changed
@@ -0,0 +1,144 @@
+import base64
+import datetime
+import hashlib
+import hmac
+import json
+import os
+import uuid
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List
+from sqlalchemy import Select, Text, and_, cast, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.alert_record import AlertRecord
+from schemas.alert import AlertRequestModel
+from utils.json_stream import JSON_STREAM_FETCH_ROWS
+
+PAGE_TOKEN_SECRET = os.getenv("PAGE_TOKEN_SECRET", os.getenv("SECRET_KEY", "SECRET_KEY")).encode()
+ALERT_PAGE_DEFAULT_LIMIT = int(os.getenv("ALERT_PAGE_DEFAULT_LIMIT", "50"))
+ALERT_PAGE_MAX_LIMIT = int(os.getenv("ALERT_PAGE_MAX_LIMIT", "1000"))
+
+# Filter(name, value) names accepted by the engine; every one of them maps to
+# a column that follows customer_id in one of the composite (customer_id,
+# column, alert_time, id) indexes on alerts. Keep models.alert_record in step.
+FILTER_COLUMNS = {
+    "severity": AlertRecord.severity,
+    "policy.severity": AlertRecord.severity,
+    "status": AlertRecord.status,
+    "alert.status": AlertRecord.status,
+    "assetId": AlertRecord.asset_external_id,
+    "resource.id": AlertRecord.asset_external_id,
+    "policyName": AlertRecord.policy_name,
+    "policy.name": AlertRecord.policy_name,
+}
+
+
+class InvalidQuery(ValueError):
+    pass
+
+
+@dataclass
+class AlertSearch:
+    """A validated search: the keyset-continued query (without LIMIT) and its page size."""
+    query: Select
+    limit: int
+    fingerprint: str
+
+
+def _query_fingerprint(customer_id: uuid.UUID, request: AlertRequestModel) -> str:
+    """Binds a page token to the query it was issued for."""
+    shape = {
+        "c": str(customer_id),
+        "t": request.timeRange.model_dump(mode="json") if request.timeRange else None,
+        "f": sorted((f.name, f.value) for f in request.filters or []),
+    }
+    return hashlib.sha256(json.dumps(shape, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _sign(payload: bytes) -> str:
+    return hmac.new(PAGE_TOKEN_SECRET, payload, hashlib.sha256).hexdigest()[:32]
+
+
+def encode_page_token(alert_time: datetime.datetime, alert_id: uuid.UUID, fingerprint: str) -> str:
+    payload = json.dumps({"t": alert_time.isoformat(), "i": str(alert_id), "q": fingerprint},
+                         separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=") + "." + _sign(payload)
+
+
+def decode_page_token(token: str, fingerprint: str):
+    try:
+        encoded, signature = token.rsplit(".", 1)
+        payload = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4))
+        if not hmac.compare_digest(_sign(payload), signature):
+            raise InvalidQuery("Invalid page token")
+        data = json.loads(payload)
+        if data["q"] != fingerprint:
+            raise InvalidQuery("Page token does not match this query")
+        return datetime.datetime.fromisoformat(data["t"]), uuid.UUID(data["i"])
+    except InvalidQuery:
+        raise
+    except (ValueError, KeyError, TypeError):
+        raise InvalidQuery("Invalid page token")
+
+
+def build_alert_query(customer_id: uuid.UUID, request: AlertRequestModel) -> Select:
+    """Translate the request into indexed predicates, newest alerts first.
+
+    Values of the same filter name are OR-ed (IN), different names AND-ed.
+    """
+    predicates = [AlertRecord.customer_id == customer_id]
+    if request.timeRange:
+        predicates.append(AlertRecord.alert_time >= request.timeRange.startDate)
+        predicates.append(AlertRecord.alert_time <= request.timeRange.endDate)
+
+    values_by_name: Dict[str, List[str]] = {}
+    for f in request.filters or []:
+        if f.name not in FILTER_COLUMNS:
+            raise InvalidQuery(f"Unsupported filter '{f.name}'")
+        values_by_name.setdefault(f.name, []).append(f.value)
+    for name, values in values_by_name.items():
+        column = FILTER_COLUMNS[name]
+        predicates.append(column == values[0] if len(values) == 1 else column.in_(values))
+
+    return (
+        select(AlertRecord.id, AlertRecord.alert_time, AlertRecord.payload)
+        .where(and_(*predicates))
+        .order_by(AlertRecord.alert_time.desc(), AlertRecord.id.desc())
+    )
+
+
+def prepare_alert_search(customer_id: uuid.UUID, request: AlertRequestModel) -> AlertSearch:
+    limit = min(request.limit or ALERT_PAGE_DEFAULT_LIMIT, ALERT_PAGE_MAX_LIMIT)
+    if limit < 1:
+        raise InvalidQuery("limit must be positive")
+    fingerprint = _query_fingerprint(customer_id, request)
+    query = build_alert_query(customer_id, request)
+    if request.pageToken:
+        last_time, last_id = decode_page_token(request.pageToken, fingerprint)
+        # Keyset: continue strictly after the last row of the previous page
+        query = query.where(tuple_(AlertRecord.alert_time, AlertRecord.id) < tuple_(last_time, last_id))
+    return AlertSearch(query=query, limit=limit, fingerprint=fingerprint)
+
+
+async def iter_alert_payloads(db: AsyncSession, search: AlertSearch, tail: Dict[str, Any]) -> AsyncIterator[List[bytes]]:
+    """Batches of alert payloads as raw JSON, for utils.json_stream.
+
+    The JSONB is read as text and passed through untouched, so rows are
+    never decoded or re-encoded. tail["nextPageToken"] is set when there is
+    another page.
+    """
+    query = search.query.with_only_columns(
+        AlertRecord.id, AlertRecord.alert_time, cast(AlertRecord.payload, Text).label("payload")
+    )
+    result = await db.stream(query.limit(search.limit + 1).execution_options(yield_per=JSON_STREAM_FETCH_ROWS))
+    emitted = 0
+    last = None
+    async for partition in result.partitions(JSON_STREAM_FETCH_ROWS):
+        batch = []
+        for row in partition:
+            if emitted == search.limit:
+                tail["nextPageToken"] = encode_page_token(last.alert_time, last.id, search.fingerprint)
+                break
+            batch.append(row.payload.encode())
+            emitted += 1
+            last = row
+        yield batch
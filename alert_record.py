@@ -0,0 +1,37 @@
+import datetime
+import uuid
+from typing import Any, Dict, Optional
+from sqlalchemy import DateTime, Index, Integer, String, UniqueConstraint
+from sqlalchemy.dialects.postgresql import JSONB, UUID as PG_UUID
+from sqlalchemy.orm import Mapped, mapped_column
+from models.base import Base
+
+
+class AlertRecord(Base):
+    """Stored form of models.alert.AlertModel, one row per (customer, external alert id)."""
+    __tablename__ = "alerts"
+
+    id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    customer_id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), nullable=False)
+    external_alert_id: Mapped[str] = mapped_column(String, nullable=False)
+    asset_external_id: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    policy_name: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    severity: Mapped[str] = mapped_column(String, nullable=False)
+    status: Mapped[str] = mapped_column(String, nullable=False)
+    alert_time: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    payload: Mapped[Dict[str, Any]] = mapped_column(JSONB, nullable=False)
+    # sha256 of the canonical payload as last sent (before any status change); a resent, unchanged alert is skipped
+    content_hash: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    updated_at: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("customer_id", "external_alert_id", name="uq_alerts_customer_external_alert_id"),
+        # Keyset pagination walks (alert_time, id) descending within a tenant (a
+        # backward index scan); the filtered variants keep the equality filter
+        # ahead of the sort key.
+        Index("ix_alerts_customer_time_id", "customer_id", "alert_time", "id"),
+        Index("ix_alerts_customer_severity_time_id", "customer_id", "severity", "alert_time", "id"),
+        Index("ix_alerts_customer_status_time_id", "customer_id", "status", "alert_time", "id"),
+        Index("ix_alerts_customer_asset_time_id", "customer_id", "asset_external_id", "alert_time", "id"),
+        Index("ix_alerts_customer_policy_time_id", "customer_id", "policy_name", "alert_time", "id"),
+    )
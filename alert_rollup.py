@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import os
+import uuid
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import delete, func, select, text, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.alert_record import AlertRecord
+from models.asset_alert_count import AssetAlertCount
+
+logger = logging.getLogger(__name__)
+
+# Alerts in these statuses count towards an asset's alert counts
+OPEN_ALERT_STATUSES = tuple(s.strip().lower() for s in os.getenv("OPEN_ALERT_STATUSES", "open").split(","))
+ROLLUP_RECONCILE_INTERVAL_SECONDS = int(os.getenv("ROLLUP_RECONCILE_INTERVAL_SECONDS", "3600"))
+
+# (asset_external_id, severity) -> count change
+RollupDelta = Counter
+# (asset_external_id, severity, status) of one alert, or None when it does not exist
+AlertKey = Optional[Tuple[Optional[str], str, str]]
+
+
+def is_open(status: str) -> bool:
+    return status.lower() in OPEN_ALERT_STATUSES
+
+
+def add_transition(delta: RollupDelta, before: AlertKey, after: AlertKey) -> None:
+    """Accumulate the count change for one alert moving from `before` to `after`."""
+    if before is not None and before[0] and is_open(before[2]):
+        delta[(before[0], before[1])] -= 1
+    if after is not None and after[0] and is_open(after[2]):
+        delta[(after[0], after[1])] += 1
+
+
+async def lock_customer_rollup(db: AsyncSession, customer_id: uuid.UUID, exclusive: bool = False) -> None:
+    """Writers take the shared lock; reconciliation takes it exclusively so it
+    sees no in-flight deltas while comparing against the alerts table."""
+    fn = "pg_advisory_xact_lock" if exclusive else "pg_advisory_xact_lock_shared"
+    await db.execute(text(f"SELECT {fn}(hashtext(:key))"), {"key": f"alert_rollup:{customer_id}"})
+
+
+async def apply_rollup_delta(db: AsyncSession, customer_id: uuid.UUID, delta: RollupDelta) -> None:
+    """Apply all non-zero changes with one multi-row upsert (count = count + change)."""
+    rows = [
+        {"customer_id": customer_id, "asset_external_id": asset, "severity": severity, "count": change}
+        # Sorted so concurrent writers lock rollup rows in the same order
+        for (asset, severity), change in sorted(delta.items()) if change
+    ]
+    if not rows:
+        return
+    stmt = insert(AssetAlertCount).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["customer_id", "asset_external_id", "severity"],
+        set_={"count": AssetAlertCount.count + stmt.excluded.count},
+    )
+    await db.execute(stmt)
+
+    # Cells that may have dropped to zero are removed so the table only holds live counts
+    decremented = [(row["asset_external_id"], row["severity"]) for row in rows if row["count"] < 0]
+    if decremented:
+        await db.execute(delete(AssetAlertCount).where(
+            AssetAlertCount.customer_id == customer_id,
+            AssetAlertCount.count <= 0,
+            tuple_(AssetAlertCount.asset_external_id, AssetAlertCount.severity).in_(decremented),
+        ))
+
+
+async def load_alert_counts(db: AsyncSession, customer_id: uuid.UUID,
+                            asset_ids: Iterable[str]) -> Dict[str, List[dict]]:
+    """AlertsCountModel-shaped counts for a page of assets, in one indexed query."""
+    asset_ids = list(asset_ids)
+    counts: Dict[str, List[dict]] = {asset_id: [] for asset_id in asset_ids}
+    if not asset_ids:
+        return counts
+    result = await db.execute(
+        select(AssetAlertCount.asset_external_id, AssetAlertCount.severity, AssetAlertCount.count)
+        .where(AssetAlertCount.customer_id == customer_id, AssetAlertCount.asset_external_id.in_(asset_ids))
+    )
+    for asset_id, severity, count in result:
+        counts[asset_id].append({"count": count, "severity": severity})
+    return counts
+
+
+async def reconcile_customer(db: AsyncSession, customer_id: uuid.UUID) -> int:
+    """Recompute one tenant's counts from the alerts table and repair any drift.
+
+    Returns the number of (asset, severity) cells that were wrong.
+    """
+    await lock_customer_rollup(db, customer_id, exclusive=True)
+    truth_rows = await db.execute(
+        select(AlertRecord.asset_external_id, AlertRecord.severity, func.count())
+        .where(
+            AlertRecord.customer_id == customer_id,
+            AlertRecord.asset_external_id.is_not(None),
+            func.lower(AlertRecord.status).in_(OPEN_ALERT_STATUSES),
+        )
+        .group_by(AlertRecord.asset_external_id, AlertRecord.severity)
+    )
+    truth = {(asset, severity): count for asset, severity, count in truth_rows}
+    current_rows = await db.execute(
+        select(AssetAlertCount.asset_external_id, AssetAlertCount.severity, AssetAlertCount.count)
+        .where(AssetAlertCount.customer_id == customer_id)
+    )
+    current = {(asset, severity): count for asset, severity, count in current_rows}
+
+    delta: RollupDelta = Counter()
+    for key in truth.keys() | current.keys():
+        change = truth.get(key, 0) - current.get(key, 0)
+        if change:
+            delta[key] = change
+    if delta:
+        logger.warning("Alert rollup drift for customer %s: %d cells repaired", customer_id, len(delta))
+        await apply_rollup_delta(db, customer_id, delta)
+    await db.commit()
+    return len(delta)
+
+
+async def reconcile_all(db: AsyncSession) -> int:
+    customer_ids = (await db.execute(
+        select(AlertRecord.customer_id).distinct().union(select(AssetAlertCount.customer_id).distinct())
+    )).scalars().all()
+    drift = 0
+    for customer_id in customer_ids:
+        drift += await reconcile_customer(db, customer_id)
+    return drift
+
+
+class RollupReconciler:
+    """Runs reconcile_all every ROLLUP_RECONCILE_INTERVAL_SECONDS in the background."""
+
+    def __init__(self, interval: int = ROLLUP_RECONCILE_INTERVAL_SECONDS):
+        self.interval = interval
+        self.last_drift: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        from database import SessionLocal
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                async with SessionLocal() as db:
+                    self.last_drift = await reconcile_all(db)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Alert rollup reconciliation failed")
+
+    def start(self) -> None:
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run(), name="alert-rollup-reconcile")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+rollup_reconciler = RollupReconciler()
@@ -0,0 +1,61 @@
+import uuid
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from auth.tenant_access import authorize_customer
+from auth.tokens import Principal
+from database import get_db, read_session_factory
+from schemas.alert import AlertListRequestModel, AlertRequestModel, AlertResolveRequestModel
+from utils.alert_ingest import ingest_alerts, set_alert_status
+from utils.alert_query import InvalidQuery, iter_alert_payloads, prepare_alert_search
+from utils.json_stream import json_stream_response
+
+router = APIRouter()
+
+
+@router.post("/customers/{customer_id}/alerts/search")
+async def alerts_search(
+    customer_id: uuid.UUID,
+    request: AlertRequestModel,
+    principal: Principal = Depends(authorize_customer),
+):
+    # Validated before streaming starts, while a 400 can still be returned
+    try:
+        search = prepare_alert_search(customer_id, request)
+    except InvalidQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    tail = {"nextPageToken": None}
+
+    async def batches():
+        # The session lives as long as the response body, not the request handler
+        async with (await read_session_factory())() as db:
+            async for batch in iter_alert_payloads(db, search, tail):
+                yield batch
+
+    return json_stream_response(batches(), tail)
+
+
+@router.post("/customers/{customer_id}/alerts")
+async def alerts_ingest(
+    customer_id: uuid.UUID,
+    request: AlertListRequestModel,
+    response: Response,
+    principal: Principal = Depends(authorize_customer),
+):
+    # Chunks are written concurrently and commit independently; see ingest_alerts
+    result = await ingest_alerts(customer_id, request.alerts)
+    if result["failedChunks"]:
+        # Some chunks are committed and some are not: report per chunk rather than a bare 500
+        response.status_code = 207
+    return result
+
+
+@router.post("/customers/{customer_id}/alerts/resolve")
+async def alerts_resolve(
+    customer_id: uuid.UUID,
+    request: AlertResolveRequestModel,
+    db: AsyncSession = Depends(get_db),
+    principal: Principal = Depends(authorize_customer),
+):
+    changed = await set_alert_status(db, customer_id, request.alertIds, request.status)
+    return {"updated": changed}
@@ -68,3 +68,17 @@ class AssetModel(BaseModel):
         return value  # If already datetime, keep it
     
     model_config = {"populate_by_name": True, "alias_generator": None}
+
+
+class AssetSearchRequestModel(BaseModel):
+    # Values inside one list are OR-ed; every given field must match (AND)
+    riskGrade: Optional[List[str]] = None
+    vpcExternalAssetId: Optional[List[str]] = None
+    cloudType: Optional[List[str]] = None
+    assetClass: Optional[List[str]] = None
+    serviceName: Optional[List[str]] = None
+    ipAddresses: Optional[List[str]] = None
+    # key -> value; a null value only requires the tag key to be present
+    tags: Optional[Dict[str, Optional[str]]] = None
+    limit: int = Field(100, ge=1, le=1000)
+    after: Optional[str] = None
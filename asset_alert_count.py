@@ -0,0 +1,15 @@
+import uuid
+from sqlalchemy import Integer, String
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.orm import Mapped, mapped_column
+from models.base import Base
+
+
+class AssetAlertCount(Base):
+    """Open-alert count per (customer, asset, severity), maintained incrementally by alert ingest."""
+    __tablename__ = "asset_alert_counts"
+
+    customer_id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), primary_key=True)
+    asset_external_id: Mapped[str] = mapped_column(String, primary_key=True)
+    severity: Mapped[str] = mapped_column(String, primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
@@ -0,0 +1,168 @@
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List
+from pydantic import ValidationError
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.asset_record import AssetRecord
+from schemas.asset import AssetModel
+from utils.asset_search import asset_index
+
+ASSET_INGEST_BATCH_SIZE = int(os.getenv("ASSET_INGEST_BATCH_SIZE", "500"))
+ASSET_INGEST_MAX_LINE_BYTES = int(os.getenv("ASSET_INGEST_MAX_LINE_BYTES", str(1024 * 1024)))
+# Reports keep only the most recent batches and the first rejections, so they stay small
+ASSET_INGEST_REPORT_BATCHES = 100
+ASSET_INGEST_REPORT_REJECTIONS = 100
+
+_UPSERT_COLUMNS = (
+    "asset_id", "name", "cloud_type", "asset_type", "asset_class", "service_name", "resource_type",
+    "region_id", "risk_grade", "vpc_external_asset_id", "account_name", "tags", "ip_addresses",
+    "deleted", "created_ts", "insert_ts", "payload", "updated_at",
+)
+
+
+def asset_row(customer_id: uuid.UUID, asset: AssetModel, now: int) -> Dict[str, Any]:
+    return {
+        "customer_id": customer_id,
+        "external_asset_id": asset.external_asset_id,
+        "asset_id": asset.id,
+        "name": asset.name,
+        "cloud_type": asset.cloud_type,
+        "asset_type": asset.asset_type,
+        "asset_class": asset.asset_class,
+        "service_name": asset.service_name,
+        "resource_type": asset.resource_type,
+        "region_id": asset.region_id,
+        "risk_grade": asset.risk_grade,
+        "vpc_external_asset_id": asset.vpc_external_asset_id,
+        "account_name": asset.account_name,
+        "tags": asset.tags,
+        "ip_addresses": asset.ip_addresses,
+        "deleted": asset.deleted,
+        "created_ts": asset.created_ts,
+        "insert_ts": asset.insert_ts,
+        "payload": asset.model_dump(mode="json", by_alias=True),
+        "updated_at": now,
+    }
+
+
+async def upsert_assets(db: AsyncSession, rows: List[Dict[str, Any]]) -> None:
+    """One multi-row INSERT ... ON CONFLICT per batch."""
+    stmt = insert(AssetRecord).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_assets_customer_external_asset_id",
+        set_={column: stmt.excluded[column] for column in _UPSERT_COLUMNS},
+    )
+    await db.execute(stmt)
+
+
+@dataclass
+class IngestReport:
+    accepted: int = 0
+    rejected: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+    recent_batches: List[dict] = field(default_factory=list)
+    rejections: List[dict] = field(default_factory=list)
+
+    def reject(self, line_number: int, error: str) -> None:
+        self.rejected += 1
+        if len(self.rejections) < ASSET_INGEST_REPORT_REJECTIONS:
+            self.rejections.append({"line": line_number, "error": error})
+
+    def record_batch(self, rows: int, seconds: float) -> None:
+        self.batches += 1
+        self.accepted += rows
+        self.recent_batches.append({
+            "batch": self.batches,
+            "rows": rows,
+            "seconds": round(seconds, 4),
+            "rows_per_second": round(rows / seconds, 1) if seconds else None,
+        })
+        del self.recent_batches[:-ASSET_INGEST_REPORT_BATCHES]
+
+    def as_dict(self) -> dict:
+        return {
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "seconds": round(self.seconds, 3),
+            "rows_per_second": round(self.accepted / self.seconds, 1) if self.seconds else None,
+            "recent_batches": self.recent_batches,
+            "rejections": self.rejections,
+        }
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_bytes: int = ASSET_INGEST_MAX_LINE_BYTES):
+    """Split a byte stream into lines without ever holding more than one line
+    (plus one chunk) in memory. Oversized lines are yielded as None."""
+    buffer = bytearray()
+    skipping = False
+    async for chunk in chunks:
+        buffer += chunk
+        while True:
+            newline = buffer.find(b"\n")
+            if newline < 0:
+                break
+            line = bytes(buffer[:newline])
+            del buffer[:newline + 1]
+            if skipping:
+                skipping = False
+                yield None
+            else:
+                yield line
+        if len(buffer) > max_line_bytes:
+            skipping = True
+            buffer.clear()
+    if skipping:
+        yield None
+    elif buffer.strip():
+        yield bytes(buffer)
+
+
+async def ingest_ndjson(db: AsyncSession, customer_id: uuid.UUID, chunks: AsyncIterator[bytes],
+                        batch_size: int = ASSET_INGEST_BATCH_SIZE) -> IngestReport:
+    """Validate and upsert NDJSON assets in fixed-size batches.
+
+    Each batch is committed on its own, so memory and lock footprint are
+    bounded by batch_size rather than by the payload. Bad lines are
+    reported and skipped without aborting the stream.
+    """
+    # 21 bind parameters per row; asyncpg allows at most 32767 per statement
+    batch_size = max(1, min(batch_size, 1500))
+    report = IngestReport()
+    started = time.perf_counter()
+    batch: Dict[str, Dict[str, Any]] = {}
+    line_number = 0
+
+    async def flush():
+        batch_started = time.perf_counter()
+        await upsert_assets(db, list(batch.values()))
+        await db.commit()
+        asset_index.apply(customer_id, list(batch.values()))
+        report.record_batch(len(batch), time.perf_counter() - batch_started)
+        batch.clear()
+
+    async for line in iter_lines(chunks):
+        line_number += 1
+        if line is None:
+            report.reject(line_number, "line exceeds maximum size")
+            continue
+        if not line.strip():
+            continue
+        try:
+            asset = AssetModel.model_validate_json(line)
+        except ValidationError as e:
+            report.reject(line_number, str(e.errors(include_url=False, include_input=False)))
+            continue
+        # Last write wins for duplicates inside a batch (ON CONFLICT cannot touch a row twice)
+        batch[asset.external_asset_id] = asset_row(customer_id, asset, int(time.time()))
+        if len(batch) >= batch_size:
+            await flush()
+
+    if batch:
+        await flush()
+    report.seconds = time.perf_counter() - started
+    return report
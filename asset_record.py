@@ -0,0 +1,46 @@
+import datetime
+import uuid
+from typing import Any, Dict, List, Optional
+from sqlalchemy import Boolean, DateTime, Index, Integer, String, UniqueConstraint, ARRAY
+from sqlalchemy.dialects.postgresql import JSONB, UUID as PG_UUID
+from sqlalchemy.orm import Mapped, mapped_column
+from models.base import Base
+
+
+class AssetRecord(Base):
+    """Stored form of schemas.asset.AssetModel, one row per (customer, externalAssetId)."""
+    __tablename__ = "assets"
+
+    id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    customer_id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), nullable=False)
+    external_asset_id: Mapped[str] = mapped_column(String, nullable=False)
+    asset_id: Mapped[str] = mapped_column(String, nullable=False)
+    name: Mapped[str] = mapped_column(String, nullable=False)
+    cloud_type: Mapped[str] = mapped_column(String, nullable=False)
+    asset_type: Mapped[str] = mapped_column(String, nullable=False)
+    asset_class: Mapped[str] = mapped_column(String, nullable=False)
+    service_name: Mapped[str] = mapped_column(String, nullable=False)
+    resource_type: Mapped[str] = mapped_column(String, nullable=False)
+    region_id: Mapped[str] = mapped_column(String, nullable=False)
+    risk_grade: Mapped[str] = mapped_column(String, nullable=False)
+    vpc_external_asset_id: Mapped[str] = mapped_column(String, nullable=False)
+    account_name: Mapped[str] = mapped_column(String, nullable=False)
+    tags: Mapped[Dict[str, str]] = mapped_column(JSONB, nullable=False, default=dict)
+    ip_addresses: Mapped[List[str]] = mapped_column(ARRAY(String), nullable=False, default=list)
+    deleted: Mapped[bool] = mapped_column(Boolean, default=False)
+    created_ts: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    insert_ts: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    # Full AssetModel payload (by alias) for the fields that are not broken out above
+    payload: Mapped[Dict[str, Any]] = mapped_column(JSONB, nullable=False)
+    updated_at: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("customer_id", "external_asset_id", name="uq_assets_customer_external_asset_id"),
+        # Asset search: tags @> / ? and ip_addresses && go through GIN, the scalar
+        # filters through per-tenant btrees that the planner can BitmapAnd together
+        Index("ix_assets_tags_gin", "tags", postgresql_using="gin"),
+        Index("ix_assets_ip_addresses_gin", "ip_addresses", postgresql_using="gin"),
+        Index("ix_assets_customer_risk_grade", "customer_id", "risk_grade"),
+        Index("ix_assets_customer_vpc", "customer_id", "vpc_external_asset_id"),
+        Index("ix_assets_customer_cloud_class_service", "customer_id", "cloud_type", "asset_class", "service_name"),
+    )
@@ -0,0 +1,350 @@
+import asyncio
+import bisect
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple, Union
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.asset_record import AssetRecord
+from schemas.asset import AssetSearchRequestModel
+
+logger = logging.getLogger(__name__)
+
+# Optional in-process index; without it every search is answered by Postgres (GIN/btree)
+ASSET_BITMAP_INDEX = os.getenv("ASSET_BITMAP_INDEX", "false").lower() == "true"
+ASSET_INDEX_MAX_TENANTS = int(os.getenv("ASSET_INDEX_MAX_TENANTS", "20"))
+# Rebuilding from a fresh snapshot picks up writes made by other workers and compacts the index
+ASSET_INDEX_REBUILD_SECONDS = int(os.getenv("ASSET_INDEX_REBUILD_SECONDS", "300"))
+ASSET_INDEX_SNAPSHOT_BATCH = 5000
+
+# Request field -> indexed scalar column
+SEARCH_FIELDS = {
+    "riskGrade": "risk_grade",
+    "vpcExternalAssetId": "vpc_external_asset_id",
+    "cloudType": "cloud_type",
+    "assetClass": "asset_class",
+    "serviceName": "service_name",
+}
+
+Term = Tuple[str, ...]
+# Sparse posting lists are sets of ordinals; dense ones are int bitsets
+Postings = Union[Set[int], int]
+_LIVE: Term = ("live",)
+# What a search returns per asset (the shape utils.json_stream.encode_asset reads)
+_RESULT_COLUMNS = (AssetRecord.external_asset_id, AssetRecord.created_ts, AssetRecord.insert_ts, AssetRecord.payload)
+
+
+def build_asset_search_query(customer_id: uuid.UUID, request: AssetSearchRequestModel) -> Select:
+    query = select(*_RESULT_COLUMNS).where(AssetRecord.customer_id == customer_id, AssetRecord.deleted.is_(False))
+    for field, column in SEARCH_FIELDS.items():
+        values = getattr(request, field)
+        if values:
+            query = query.where(getattr(AssetRecord, column).in_(values))
+    if request.ipAddresses:
+        query = query.where(AssetRecord.ip_addresses.overlap(request.ipAddresses))
+    for key, value in (request.tags or {}).items():
+        query = query.where(AssetRecord.tags.has_key(key) if value is None else AssetRecord.tags.contains({key: value}))
+    if request.after:
+        query = query.where(AssetRecord.external_asset_id > request.after)
+    return query.order_by(AssetRecord.external_asset_id).limit(request.limit)
+
+
+def asset_terms(row: Mapping[str, Any]) -> frozenset:
+    terms = [(column, row[column]) for column in SEARCH_FIELDS.values() if row[column] is not None]
+    terms.extend(("ip", ip) for ip in row["ip_addresses"] or ())
+    for key, value in (row["tags"] or {}).items():
+        terms.append(("tag", key))
+        terms.append(("tag", key, value))
+    terms.append(_LIVE)
+    return frozenset(terms)
+
+
+def request_groups(request: AssetSearchRequestModel) -> List[List[Term]]:
+    """Conjunction of disjunctions: a row matches when it has a term from every group."""
+    groups = [[(column, value) for value in getattr(request, field)]
+              for field, column in SEARCH_FIELDS.items() if getattr(request, field)]
+    if request.ipAddresses:
+        groups.append([("ip", ip) for ip in request.ipAddresses])
+    for key, value in (request.tags or {}).items():
+        groups.append([("tag", key) if value is None else ("tag", key, value)])
+    return groups
+
+
+def _to_bitmap(positions: Iterable[int]) -> int:
+    positions = list(positions)
+    if not positions:
+        return 0
+    buffer = bytearray((max(positions) >> 3) + 1)
+    for position in positions:
+        buffer[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(buffer, "little")
+
+
+def _size(postings: Postings) -> int:
+    return len(postings) if isinstance(postings, set) else postings.bit_count()
+
+
+def _union(items: List[Postings]) -> Postings:
+    sets = [item for item in items if isinstance(item, set)]
+    bitmaps = [item for item in items if not isinstance(item, set)]
+    if not bitmaps:
+        return set().union(*sets)
+    result = 0
+    for bitmap in bitmaps:
+        result |= bitmap
+    return result | _to_bitmap(set().union(*sets)) if sets else result
+
+
+def _intersect(a: Postings, b: Postings) -> Postings:
+    if isinstance(a, set) and isinstance(b, set):
+        return a & b
+    if isinstance(a, set) or isinstance(b, set):
+        small, bitmap = (a, b) if isinstance(a, set) else (b, a)
+        if len(small) <= 64:
+            return {position for position in small if (bitmap >> position) & 1}
+        return _to_bitmap(small) & bitmap
+    return a & b
+
+
+def _low_bits(bitmap: int, offset: int, limit: Optional[int], stop: Optional[int] = None) -> List[int]:
+    """Positions of the lowest set bits of `bitmap`, shifted by `offset`, below `stop`."""
+    digits = bin(bitmap)
+    end = len(digits)
+    found = []
+    while limit is None or len(found) < limit:
+        index = digits.rfind("1", 2, end)
+        if index < 0:
+            break
+        position = offset + len(digits) - 1 - index
+        if stop is not None and position >= stop:
+            break
+        found.append(position)
+        end = index
+    return found
+
+
+class TenantIndex:
+    """Inverted index of one tenant's assets.
+
+    Each asset gets an ordinal; postings map a term (column/value, IP, tag
+    key, tag key/value) to the ordinals that carry it. Ordinals below
+    `sorted_upto` come from a snapshot read in externalAssetId order, so the
+    bit order there is the page order; assets added since are few and are
+    sorted at query time.
+    """
+
+    def __init__(self):
+        self.ordinals: Dict[str, int] = {}
+        self.ids: List[str] = []
+        self.terms: List[Optional[Tuple[Term, ...]]] = []
+        self.postings: Dict[Term, Postings] = {}
+        self.sorted_upto = 0
+        # One shared tuple per distinct term; per-asset term lists only hold references
+        self._interned: Dict[Term, Term] = {}
+
+    def _dense_threshold(self) -> int:
+        # A bitset costs len(ids)/8 bytes; a set costs ~60 bytes per member
+        return max(64, len(self.ids) // 512)
+
+    def _add(self, term: Term, positions: List[int]) -> None:
+        postings = self.postings.get(term)
+        if postings is None or isinstance(postings, set):
+            if postings is None:
+                postings = set(positions)
+            else:
+                postings.update(positions)
+            if len(postings) > self._dense_threshold():
+                postings = _to_bitmap(postings)
+        else:
+            postings |= _to_bitmap(positions)
+        self.postings[term] = postings
+
+    def _remove(self, term: Term, positions: List[int]) -> None:
+        postings = self.postings.get(term)
+        if postings is None:
+            return
+        if isinstance(postings, set):
+            postings.difference_update(positions)
+        else:
+            postings &= ~_to_bitmap(positions)
+        if postings:
+            self.postings[term] = postings
+        else:
+            del self.postings[term]
+
+    def apply(self, rows: Iterable[Mapping[str, Any]]) -> None:
+        """Index a batch of asset rows (AssetRecord columns); deleted rows are removed.
+
+        Changes are grouped per term so each posting list is rewritten once per batch.
+        """
+        added: Dict[Term, List[int]] = defaultdict(list)
+        removed: Dict[Term, List[int]] = defaultdict(list)
+        for row in rows:
+            external_id = row["external_asset_id"]
+            position = self.ordinals.get(external_id)
+            new_terms = frozenset() if row.get("deleted") else asset_terms(row)
+            if position is None:
+                # New asset (the whole snapshot build takes this path): nothing to diff against
+                if not new_terms:
+                    continue
+                position = self.ordinals[external_id] = len(self.ids)
+                self.ids.append(external_id)
+                self.terms.append(None)
+                changed = new_terms
+            else:
+                old_terms = frozenset(self.terms[position] or ())
+                for term in old_terms - new_terms:
+                    removed[term].append(position)
+                changed = new_terms - old_terms
+            for term in changed:
+                added[term].append(position)
+            self.terms[position] = tuple(self._interned.setdefault(term, term) for term in new_terms) or None
+        for term, positions in removed.items():
+            self._remove(term, positions)
+        for term, positions in added.items():
+            self._add(term, positions)
+
+    def query(self, groups: List[List[Term]], after: Optional[str], limit: int) -> Tuple[List[str], int]:
+        """Up to `limit` matching externalAssetIds after `after` in id order, and the total match count."""
+        result = self.postings.get(_LIVE, set())
+        candidates = [_union([self.postings[term] for term in group if term in self.postings]) for group in groups]
+        # Most selective group first keeps the intermediate results small
+        for postings in sorted(candidates, key=_size):
+            result = _intersect(result, postings)
+            if not result:
+                return [], 0
+        total = _size(result)
+
+        if isinstance(result, set):
+            ids = sorted(self.ids[position] for position in result)
+            start = bisect.bisect_right(ids, after) if after else 0
+            return ids[start:start + limit], total
+
+        start = bisect.bisect_right(self.ids, after, 0, self.sorted_upto) if after else 0
+        in_order = _low_bits(result >> start, start, limit, self.sorted_upto)
+        appended = sorted(
+            external_id for external_id in
+            (self.ids[position] for position in _low_bits(result >> self.sorted_upto, self.sorted_upto, None))
+            if after is None or external_id > after
+        )
+        merged = sorted([self.ids[position] for position in in_order] + appended[:limit])
+        return merged[:limit], total
+
+
+_SNAPSHOT_COLUMNS = (
+    AssetRecord.external_asset_id,
+    *(getattr(AssetRecord, column) for column in SEARCH_FIELDS.values()),
+    AssetRecord.ip_addresses,
+    AssetRecord.tags,
+)
+
+
+class AssetBitmapIndex:
+    """Per-tenant TenantIndex cache, built in the background from a database snapshot.
+
+    Until a tenant's index is ready, lookup() returns None and searches go to
+    Postgres. Ingest on this worker updates a loaded tenant incrementally;
+    writes made by other workers show up at the next rebuild
+    (ASSET_INDEX_REBUILD_SECONDS), which also compacts the index.
+    """
+
+    def __init__(self, max_tenants: int = ASSET_INDEX_MAX_TENANTS, rebuild_seconds: int = ASSET_INDEX_REBUILD_SECONDS):
+        self.max_tenants = max_tenants
+        self.rebuild_seconds = rebuild_seconds
+        self._tenants: "OrderedDict[uuid.UUID, tuple[float, TenantIndex]]" = OrderedDict()
+        self._builds: Dict[uuid.UUID, asyncio.Task] = {}
+        # Rows ingested while a snapshot is being read, replayed once it is loaded
+        self._pending: Dict[uuid.UUID, List[Mapping[str, Any]]] = {}
+
+    def lookup(self, customer_id: uuid.UUID) -> Optional[TenantIndex]:
+        entry = self._tenants.get(customer_id)
+        if (entry is None or time.monotonic() - entry[0] >= self.rebuild_seconds) and customer_id not in self._builds:
+            self._builds[customer_id] = asyncio.create_task(self._rebuild(customer_id), name=f"asset-index-{customer_id}")
+        if entry is None:
+            return None
+        self._tenants.move_to_end(customer_id)
+        return entry[1]
+
+    async def _rebuild(self, customer_id: uuid.UUID) -> None:
+        from database import SessionLocal
+        try:
+            async with SessionLocal() as db:
+                index = await self.build(db, customer_id)
+            self._tenants[customer_id] = (time.monotonic(), index)
+            self._tenants.move_to_end(customer_id)
+            while len(self._tenants) > self.max_tenants:
+                self._tenants.popitem(last=False)
+        except Exception:
+            logger.exception("Asset index build failed for customer %s", customer_id)
+        finally:
+            self._builds.pop(customer_id, None)
+
+    async def build(self, db: AsyncSession, customer_id: uuid.UUID) -> TenantIndex:
+        started = time.perf_counter()
+        index = TenantIndex()
+        self._pending[customer_id] = []
+        try:
+            result = await db.stream(
+                select(*_SNAPSHOT_COLUMNS)
+                .where(AssetRecord.customer_id == customer_id, AssetRecord.deleted.is_(False))
+                .order_by(AssetRecord.external_asset_id)
+                .execution_options(yield_per=ASSET_INDEX_SNAPSHOT_BATCH)
+            )
+            async for partition in result.partitions(ASSET_INDEX_SNAPSHOT_BATCH):
+                index.apply(row._mapping for row in partition)
+            index.sorted_upto = len(index.ids)
+            index.apply(self._pending[customer_id])
+        finally:
+            self._pending.pop(customer_id, None)
+        logger.info("Asset index for %s built: %d assets, %d terms in %.2fs",
+                    customer_id, len(index.ids), len(index.postings), time.perf_counter() - started)
+        return index
+
+    def apply(self, customer_id: uuid.UUID, rows: List[Mapping[str, Any]]) -> None:
+        """Feed committed asset rows to the tenant's index, if it is loaded or being built."""
+        pending = self._pending.get(customer_id)
+        if pending is not None:
+            pending.extend(rows)
+        entry = self._tenants.get(customer_id)
+        if entry is not None:
+            entry[1].apply(rows)
+
+    async def stop(self) -> None:
+        for task in list(self._builds.values()):
+            task.cancel()
+        self._builds.clear()
+
+
+asset_index = AssetBitmapIndex()
+
+
+async def search_assets(db: AsyncSession, customer_id: uuid.UUID,
+                        request: AssetSearchRequestModel) -> Dict[str, Any]:
+    """Conjunctive asset search, ordered by externalAssetId and paged by `after`."""
+    index = asset_index.lookup(customer_id) if ASSET_BITMAP_INDEX else None
+    if index is None:
+        rows = (await db.execute(build_asset_search_query(customer_id, request))).all()
+        return {
+            "rows": rows,
+            "total": None,
+            "next": rows[-1].external_asset_id if len(rows) == request.limit else None,
+        }
+
+    ids, total = index.query(request_groups(request), request.after, request.limit)
+    found = {}
+    if ids:
+        result = await db.execute(
+            select(*_RESULT_COLUMNS)
+            .where(AssetRecord.customer_id == customer_id, AssetRecord.external_asset_id.in_(ids),
+                   AssetRecord.deleted.is_(False))
+        )
+        found = {row.external_asset_id: row for row in result}
+    return {
+        # An id can vanish (or be deleted by another worker) before the next rebuild; it is simply skipped
+        "rows": [found[external_id] for external_id in ids if external_id in found],
+        "total": total,
+        "next": ids[-1] if len(ids) == request.limit else None,
+    }
@@ -0,0 +1,87 @@
+import os
+import uuid
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Query, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from auth.tenant_access import authorize_customer
+from auth.tokens import Principal
+from database import get_db, get_read_db, read_session_factory
+from models.asset_record import AssetRecord
+from schemas.asset import AssetSearchRequestModel
+from utils.alert_rollup import load_alert_counts
+from utils.asset_ingest import ASSET_INGEST_BATCH_SIZE, ingest_ndjson
+from utils.asset_search import search_assets
+from utils.json_stream import JSON_STREAM_FETCH_ROWS, encode_asset, json_stream_response
+
+# Lists are streamed, so a large page costs one fetch batch of memory rather than the whole body
+ASSET_LIST_MAX_LIMIT = int(os.getenv("ASSET_LIST_MAX_LIMIT", "100000"))
+
+router = APIRouter()
+
+
+async def _encode_assets(db: AsyncSession, customer_id: uuid.UUID, rows) -> List[bytes]:
+    """Encoded assets with alert counts from the incrementally maintained rollup, not a GROUP BY over alerts."""
+    counts = await load_alert_counts(db, customer_id, (row.external_asset_id for row in rows))
+    return [encode_asset(row._mapping, counts[row.external_asset_id]) for row in rows]
+
+
+@router.post("/customers/{customer_id}/assets/ingest")
+async def ingest_assets(
+    customer_id: uuid.UUID,
+    request: Request,
+    batch_size: int = Query(ASSET_INGEST_BATCH_SIZE, ge=1, le=1500),
+    db: AsyncSession = Depends(get_db),
+    principal: Principal = Depends(authorize_customer),
+):
+    # Body is NDJSON (one AssetModel per line), read incrementally from the socket
+    report = await ingest_ndjson(db, customer_id, request.stream(), batch_size=batch_size)
+    return report.as_dict()
+
+
+@router.get("/customers/{customer_id}/assets")
+async def list_assets(
+    customer_id: uuid.UUID,
+    limit: int = Query(100, ge=1, le=ASSET_LIST_MAX_LIMIT),
+    after: Optional[str] = Query(None, description="externalAssetId of the last asset on the previous page"),
+    principal: Principal = Depends(authorize_customer),
+):
+    query = (
+        select(AssetRecord.external_asset_id, AssetRecord.created_ts, AssetRecord.insert_ts, AssetRecord.payload)
+        .where(AssetRecord.customer_id == customer_id, AssetRecord.deleted.is_(False))
+        .order_by(AssetRecord.external_asset_id)
+        .limit(limit)
+    )
+    if after:
+        query = query.where(AssetRecord.external_asset_id > after)
+    tail = {"next": None}
+
+    async def batches():
+        # Sessions live as long as the response body; counts use their own while the cursor is open
+        factory = await read_session_factory()
+        async with factory() as db, factory() as counts_db:
+            result = await db.stream(query.execution_options(yield_per=JSON_STREAM_FETCH_ROWS))
+            emitted = 0
+            async for partition in result.partitions(JSON_STREAM_FETCH_ROWS):
+                yield await _encode_assets(counts_db, customer_id, partition)
+                emitted += len(partition)
+                if emitted == limit:
+                    tail["next"] = partition[-1].external_asset_id
+
+    return json_stream_response(batches(), tail)
+
+
+@router.post("/customers/{customer_id}/assets/search")
+async def search_customer_assets(
+    customer_id: uuid.UUID,
+    request: AssetSearchRequestModel,
+    db: AsyncSession = Depends(get_read_db),
+    principal: Principal = Depends(authorize_customer),
+):
+    result = await search_assets(db, customer_id, request)
+    items = await _encode_assets(db, customer_id, result["rows"])
+
+    async def batches():
+        yield items
+
+    return json_stream_response(batches(), {"total": result["total"], "next": result["next"]})
@@ -1,38 +1,38 @@
-import base64
+import logging
 import os
 import time
-import uuid
+from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import JSONResponse, RedirectResponse
-from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy import select, update
-from auth import mfa, otp
-from database import get_db
+from sqlalchemy.exc import IntegrityError
+from auth import otp
+from auth.otp_store import get_otp_store
+from auth.rate_limit import limit_otp_requests
+from auth.login_pipeline import commit_totp_step, load_totp_match
+from auth.jwks import JWKSUnavailable, validate_id_token
+from auth.tokens import (AZURE_IDP, Principal, create_enrolment_token, create_token, get_current_principal,
+                         verify_enrolment_token)
+from database import get_db, get_shared_read_db
 from models.consultant import Consultant
 from models.customer import Customer
 from schemas.consultant import ConsultantSchema
 from schemas.customer import CustomerSchema
-from utils.email_utils import generate_verification_token, send_otp_verification_email, send_welcome_email
-from utils.saml import get_saml_settings, init_saml_auth
+from utils.email_outbox import enqueue_otp_email, enqueue_welcome_email
+from utils.saml_cache import get_sp_metadata, init_saml_auth, prepare_saml_request
+from utils.saml_executor import process_acs_response
+from utils.customer_cache import get_customer_auth, invalidate_customer
+from utils.session_store import get_session_store
+from utils.metrics import saml_duration
+from utils.qr_codes import MFA_ENROLMENT_TTL_SECONDS, qr_cache
 router = APIRouter()
+logger = logging.getLogger(__name__)
 import jwt
-from datetime import datetime, timedelta, timezone
 from schemas.requests.login_request import EmailRequest, MFACombinedLoginRequest, OTPVerifyRequest, TOTPVerifyRequest
+from schemas.requests.token_request import TokenRequest, TokenResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi.responses import HTMLResponse
-SECRET_KEY = os.getenv("SECRET_KEY", "SECRET_KEY")
+from fastapi.responses import Response
 AES_SECRET_KEY = os.getenv("AES_SECRET_KEY", "AES_SECRET_KEY").encode()
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 60
-
-# OAuth2 scheme for token authentication
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
-
-# Function to create JWT Token
-def create_token(data: dict, expires_delta: timedelta = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)):
-    to_encode = data.copy()
-    to_encode["exp"] = datetime.now(timezone.utc) + expires_delta  # Fixed deprecated utcnow()
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 def is_consultant_email(email: str) -> bool:
     return email.endswith("@esecforte.com")
@@ -40,20 +40,24 @@ def is_consultant_email(email: str) -> bool:
 
 @router.post("/sso/acs/", response_model=ConsultantSchema)
 async def saml_acs(request: Request, db: AsyncSession = Depends(get_db)):
-    # Step 1: Process SAML response
-    saml_auth = await init_saml_auth(request)
-    saml_auth.process_response()
-    errors = saml_auth.get_errors()
+    # Step 1: Process SAML response (signature verification runs in the ACS pool)
+    saml_result = await process_acs_response(await prepare_saml_request(request))
+    errors = saml_result.errors
 
     if errors:
         raise HTTPException(status_code=400, detail={"error": "SAML Error", "details": errors})
 
-    if not saml_auth.is_authenticated():
+    if not saml_result.authenticated:
         raise HTTPException(status_code=401, detail="Authentication failed")
 
+    # Consume the SSO session started by request_otp (keyed by the AuthnRequest ID)
+    sso_session = await get_session_store().pop(saml_result.in_response_to or "")
+    if sso_session is None:
+        raise HTTPException(status_code=400, detail="SSO session expired or not found")
+
     # Step 2: Extract attributes
-    attributes = saml_auth.get_attributes()
-    print("[SAML Attributes]", attributes)
+    attributes = saml_result.attributes
+    logger.debug("SAML attributes for %s: %s", saml_result.in_response_to, attributes)
 
     email = attributes.get("http://schemas.xmlsoap.org/ws/2005/05/identity/claims/emailaddress", [None])[0]
     name = attributes.get("http://schemas.microsoft.com/identity/claims/displayname", [None])[0]
@@ -84,27 +88,37 @@ async def saml_acs(request: Request, db: AsyncSession = Depends(get_db)):
     await db.refresh(new_consultant)
     return new_consultant
 
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match uses the weak comparison: W/ prefixes are ignored, "*" matches any."""
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
 @router.get("/metadata/")
-async def metadata():
-    from onelogin.saml2.metadata import OneLogin_Saml2_Metadata
-    settings = get_saml_settings()
-    metadata, errors = OneLogin_Saml2_Metadata.builder(settings._sp, settings._security)
+async def metadata(request: Request):
+    try:
+        metadata, etag = get_sp_metadata()
+    except ValueError as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-    if errors:
-        raise HTTPException(status_code=500, detail=f"Metadata error: {errors}")
-    return HTMLResponse(content=metadata, media_type="application/xml")
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=300"}
+    if _etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=metadata, media_type="application/xml", headers=headers)
 
 @router.post("/signup/", response_model=CustomerSchema)
 async def signup(customer: CustomerSchema, db: AsyncSession = Depends(get_db)):
     # 1. Check if customer already exists
     
-    result = await db.execute(select(Customer).where(Customer.customer_email == customer.customer_email))
-    existing_customer = result.scalar_one_or_none()
-    
+    existing_customer = await get_customer_auth(customer.customer_email, db)
+
     if existing_customer:
         raise HTTPException(status_code=400, detail="Customer email already exists!")
 
     # 2. Create verification token
+    from utils.email_utils import generate_verification_token
     token = await generate_verification_token(customer.customer_email)
     expiry_timestamp = int(time.time()) + 86400  # 1 day validity
 
@@ -119,72 +133,74 @@ async def signup(customer: CustomerSchema, db: AsyncSession = Depends(get_db)):
 
     new_customer = Customer(**customer_dict)
     db.add(new_customer)
-    await db.commit()
+    # 4. Queue the welcome email in the same transaction as the insert
+    await enqueue_welcome_email(db, customer.customer_email, token)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Lost a race with a concurrent signup for the same email (unique index)
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Customer email already exists!")
     await db.refresh(new_customer)
 
-    # 4. Send email
-    await send_welcome_email(customer.customer_email, token, db)
-
     return new_customer
 
-user_sessions = {}
-
-@router.post("/request-otp")
-async def request_otp(request: Request, data: EmailRequest, db: AsyncSession = Depends(get_db)):
+@router.post("/request-otp", dependencies=[Depends(limit_otp_requests)])
+async def request_otp(request: Request, data: EmailRequest, db: AsyncSession = Depends(get_db),
+                      read_db: AsyncSession = Depends(get_shared_read_db)):
     email = data.email
     if is_consultant_email(email):
         # Consultant → return SSO URL
-        request_id = uuid.uuid4().hex
-        user_sessions[request_id] = {"email": email}
-        
-        saml_auth = await init_saml_auth(request, request_id)
-        sso_url = saml_auth.login()
+        saml_auth = await init_saml_auth(request)
+        with saml_duration.labels("login").time():
+            sso_url = saml_auth.login()
+        await get_session_store().put(saml_auth.get_last_request_id(), {"email": email})
         return JSONResponse({
             "type": "consultant",
             "sso_redirect_url": sso_url
         })
     
-    result = await db.execute(select(Customer).where(Customer.customer_email == email))
-    customer = result.scalar_one_or_none()
+    customer = await get_customer_auth(email, read_db)
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
 
-    if customer.customer_status != "APPROVED":
+    if customer.status != "APPROVED":
         raise HTTPException(status_code=403, detail="Customer not approved")
 
     code = otp.generate_otp()
-    await otp.store_otp(email, code, db)
-    print(f"[DEBUG] OTP for {email}: {code}")
-    await send_otp_verification_email(email, code, db)
+    await get_otp_store().put(email, code, db)
+    logger.debug("OTP issued for %s", email)
+    await enqueue_otp_email(db, email, code)
+    await db.commit()
     
     mfa_enabled = customer.is_mfa_enabled
 
     return {
-        "message": "OTP sent to email (check console)",
+        "message": "OTP sent to email",
         "email": email,
         "mfa_setup": mfa_enabled
     }
 
 @router.post("/mfa-login")
 async def mfa_login(data: MFACombinedLoginRequest, db: AsyncSession = Depends(get_db)):
-    if not await otp.validate_otp(data.email, data.otp, db):
+    # Auth state is loaded once (usually from cache) and both codes are checked in memory
+    existing_customer, totp_step = await load_totp_match(db, data.email, data.totp)
+    if not await get_otp_store().consume(data.email, data.otp, db):
         raise HTTPException(status_code=401, detail="Invalid OTP")
-    if not await mfa.verify_totp(data.email, data.totp, db):
-        raise HTTPException(status_code=401, detail="Invalid Authenticator Code")
-    result = await db.execute(select(Customer).where(Customer.customer_email == data.email))
-    existing_customer = result.scalar_one_or_none()
     if not existing_customer:
         raise HTTPException(status_code=404, detail="CustomerResponseModel not found")
+    # One conditional UPDATE records the TOTP step and rejects replays
+    if totp_step is None or not await commit_totp_step(db, existing_customer, totp_step):
+        raise HTTPException(status_code=401, detail="Invalid Authenticator Code")
     token = create_token({"sub": data.email})
     return {"access_token": token, "token_type": "bearer"}
 
 @router.post("/verify-otp")
 async def verify_otp(data: OTPVerifyRequest, db: AsyncSession = Depends(get_db)):
-    if not await otp.validate_otp(data.email, data.otp, db):
+    if not await get_otp_store().consume(data.email, data.otp, db):
         raise HTTPException(status_code=401, detail="Invalid OTP")
 
-    result = await db.execute(select(Customer).where(Customer.customer_email == data.email))
-    customer = result.scalar_one_or_none()
+    customer = await get_customer_auth(data.email, db)
     if not customer:
         raise HTTPException(status_code=404, detail="CustomerResponseModel not found")
 
@@ -192,21 +208,73 @@ async def verify_otp(data: OTPVerifyRequest, db: AsyncSession = Depends(get_db))
     if mfa_enabled:
         return {"message": "MFA already setup", "mfa_setup": True}
 
+    # MFA/TOTP libraries are imported on first enrolment, not at worker start
+    from auth import mfa
     secret = await mfa.generate_totp_secret(data.email)
-    qr = await mfa.generate_qr_code(data.email, secret)
 
-    await db.execute(update(Customer).where(Customer.customer_email == data.email).values(mfa_secret=secret))
+    await db.execute(update(Customer).where(Customer.id == customer.id).values(mfa_secret=secret, mfa_last_totp_step=None))
     await db.commit()
-    with open("mfa_qr.png", "wb") as f:
-        f.write(base64.b64decode(qr))
-    return {"qr_code_base64": qr, "email": data.email, "mfa_setup": False}
+    invalidate_customer(data.email)
+    # Rendered off the event loop; GET /mfa/qr.png usually finds it cached
+    qr_cache.prefetch(data.email, secret)
+    enrolment_token = create_enrolment_token(data.email, timedelta(seconds=MFA_ENROLMENT_TTL_SECONDS))
+    return {
+        "email": data.email,
+        "mfa_setup": False,
+        "enrolment_token": enrolment_token,
+        "qr_code_url": f"/mfa/qr.png?token={enrolment_token}",
+    }
+
+@router.get("/mfa/qr.png")
+async def mfa_qr_code(token: str, db: AsyncSession = Depends(get_db)):
+    try:
+        email = verify_enrolment_token(token)
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=401, detail="Invalid or expired enrolment token")
+
+    # Read past the per-process cache: verify_otp may have run on another worker moments ago
+    customer = await get_customer_auth(email, db, refresh=True)
+    # The QR code reveals the secret, so it is only served until enrolment completes
+    if not customer or customer.is_mfa_enabled or not customer.mfa_secret:
+        raise HTTPException(status_code=404, detail="No MFA enrolment in progress")
+
+    png = await qr_cache.get(email, customer.mfa_secret)
+    return Response(content=png, media_type="image/png", headers={"Cache-Control": "no-store"})
 
 @router.post("/verify-totp")
 async def verify_totp(data: TOTPVerifyRequest, db: AsyncSession = Depends(get_db)):
-    if not await mfa.verify_totp(data.email, data.totp, db):
+    customer, totp_step = await load_totp_match(db, data.email, data.totp)
+    if totp_step is None or not await commit_totp_step(db, customer, totp_step, is_mfa_enabled=True):
         raise HTTPException(status_code=401, detail="Invalid Authenticator Code")
-
-    await db.execute(update(Customer).where(Customer.customer_email == data.email).values(is_mfa_enabled=True))
-    await db.commit()
+    qr_cache.invalidate(data.email)
 
     return {"message": "Authentication successful!"}
+
+@router.get("/me")
+async def me(principal: Principal = Depends(get_current_principal)):
+    customer = principal.customer
+    return {
+        "email": principal.subject,
+        "expires_at": principal.claims["exp"],
+        "mfa_setup": customer.is_mfa_enabled if customer else None,
+        "status": customer.status if customer else None,
+    }
+
+@router.post("/azure/token", response_model=TokenResponse)
+async def azure_token(data: TokenRequest):
+    try:
+        claims = await validate_id_token(data.id_token)
+    except jwt.PyJWTError as e:
+        raise HTTPException(status_code=401, detail=f"Invalid id_token: {e}")
+    except JWKSUnavailable:
+        # No cached keys and the IdP is unreachable
+        raise HTTPException(status_code=503, detail="Identity provider keys unavailable")
+
+    # oid is the immutable object id the consultant is authorized by; the email is only informational
+    oid = claims.get("oid")
+    if not oid:
+        raise HTTPException(status_code=400, detail="Object id (oid) not found in id_token")
+    email = claims.get("email") or claims.get("preferred_username") or claims.get("upn")
+    if not email:
+        raise HTTPException(status_code=400, detail="Email not found in id_token")
+    return TokenResponse(access_token=create_token({"sub": email, "idp": AZURE_IDP, "oid": oid}))
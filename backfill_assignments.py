@@ -0,0 +1,20 @@
+import asyncio
+from database import SessionLocal, engine
+from models.base import Base
+# Imported so the join table's foreign keys resolve
+from models.consultant import Consultant  # noqa: F401
+from models.customer import Customer  # noqa: F401
+from models.customer_consultant import CustomerConsultant
+from utils.consultant_assignments import backfill_assignments
+
+# One-off: copies Customer.assigned_consultant_ids into customer_consultants (idempotent)
+async def main():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=[CustomerConsultant.__table__])
+    async with SessionLocal() as db:
+        copied = await backfill_assignments(db)
+    print(f"Backfilled {copied} consultant assignments")
+    await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
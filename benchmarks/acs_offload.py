@@ -0,0 +1,111 @@
+"""p99 latency of /request-otp while SSO callbacks hit /sso/acs/ concurrently.
+
+Runs the app in-process and compares ACS validation inline on the event loop
+(the old behaviour) against the thread and process pools:
+
+    python benchmarks/acs_offload.py --email approved@example.com
+
+Unless --saml-response is given, signature verification is simulated by
+burning --acs-cpu-ms of CPU per callback, which keeps the run independent
+of a live IdP.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# The benchmark hammers one email from one client; keep the OTP limiter out of the measurement
+os.environ.setdefault("OTP_RATE_LIMIT_IP", "1000000/1")
+os.environ.setdefault("OTP_RATE_LIMIT_EMAIL", "1000000/1")
+
+import httpx
+from main import app
+from utils import saml_executor
+
+ACS_CPU_SECONDS = 0.04
+
+
+def simulated_acs(req: dict) -> saml_executor.AcsResult:
+    started_at = time.time()
+    deadline = time.process_time() + ACS_CPU_SECONDS
+    while time.process_time() < deadline:
+        pass
+    return saml_executor.AcsResult(
+        errors=["benchmark"], error_reason=None, authenticated=False,
+        attributes={}, in_response_to=None, started_at=started_at,
+    )
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run_mode(mode: str, args) -> dict:
+    saml_executor.shutdown_acs_executor()
+    saml_executor.SAML_ACS_EXECUTOR = mode
+    saml_executor._semaphore = None
+    saml_executor.acs_stats = saml_executor.AcsStats()
+
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+    stop = asyncio.Event()
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def callbacks():
+            while not stop.is_set():
+                await client.post("/sso/acs/", data={"SAMLResponse": args.saml_payload})
+
+        async def otp_user():
+            for _ in range(args.requests):
+                started = time.perf_counter()
+                await client.post("/request-otp", json={"email": args.email})
+                latencies.append(time.perf_counter() - started)
+
+        callback_tasks = [asyncio.create_task(callbacks()) for _ in range(args.callbacks)]
+        await asyncio.gather(*(otp_user() for _ in range(args.users)))
+        stop.set()
+        await asyncio.gather(*callback_tasks)
+
+    return {
+        "mode": mode,
+        "requests": len(latencies),
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "acs": saml_executor.acs_stats.snapshot(),
+    }
+
+
+async def main():
+    global ACS_CPU_SECONDS
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--email", required=True, help="email of an APPROVED customer")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=50, help="requests per user")
+    parser.add_argument("--callbacks", type=int, default=8, help="concurrent ACS callback loops")
+    parser.add_argument("--acs-cpu-ms", type=float, default=40.0)
+    parser.add_argument("--saml-response", help="file with a captured base64 SAMLResponse")
+    parser.add_argument("--modes", default="inline,thread,process")
+    args = parser.parse_args()
+
+    ACS_CPU_SECONDS = args.acs_cpu_ms / 1000
+    args.saml_payload = "bench"
+    if args.saml_response:
+        with open(args.saml_response) as f:
+            args.saml_payload = f.read().strip()
+    else:
+        saml_executor.run_acs = simulated_acs
+
+    for mode in args.modes.split(","):
+        result = await run_mode(mode, args)
+        print(f"{result['mode']:>8}: n={result['requests']} p50={result['p50_ms']:.1f}ms "
+              f"p95={result['p95_ms']:.1f}ms p99={result['p99_ms']:.1f}ms acs={result['acs']}")
+    saml_executor.shutdown_acs_executor()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
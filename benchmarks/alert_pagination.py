@@ -0,0 +1,107 @@
+"""Per-page latency of keyset vs OFFSET pagination over the alerts table.
+
+Seeds one tenant with --rows synthetic alerts (skipped if already seeded)
+against DATABASE_URL, then times page 1 .. page 10,000:
+
+    python benchmarks/alert_pagination.py --rows 600000 --limit 50
+
+Keyset latency should stay flat with page depth; OFFSET grows linearly.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, select, text
+from database import SessionLocal, engine
+from models.alert_record import AlertRecord
+from models.base import Base
+from schemas.alert import AlertRequestModel
+from utils.alert_query import (_query_fingerprint, build_alert_query, encode_page_token, iter_alert_payloads,
+                               prepare_alert_search)
+
+BENCH_CUSTOMER_ID = uuid.UUID("00000000-0000-0000-0000-00000000a1e7")
+PAGES = (1, 10, 100, 1000, 10000)
+
+
+async def seed(rows: int) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=[AlertRecord.__table__])
+    async with SessionLocal() as db:
+        existing = (await db.execute(
+            select(func.count()).select_from(AlertRecord).where(AlertRecord.customer_id == BENCH_CUSTOMER_ID)
+        )).scalar_one()
+        if existing >= rows:
+            return
+        await db.execute(text("""
+            INSERT INTO alerts (id, customer_id, external_alert_id, asset_external_id, policy_name,
+                                severity, status, alert_time, payload, updated_at)
+            SELECT gen_random_uuid(), :customer_id, 'bench-' || g, 'asset-' || (g % 5000), 'policy-' || (g % 40),
+                   (ARRAY['critical','high','medium','low','informational'])[1 + g % 5],
+                   (ARRAY['open','resolved','dismissed'])[1 + g % 3],
+                   now() - (g || ' seconds')::interval,
+                   jsonb_build_object('id', 'bench-' || g), 0
+            FROM generate_series(:start, :stop) AS g
+            ON CONFLICT DO NOTHING
+        """), {"customer_id": BENCH_CUSTOMER_ID, "start": existing + 1, "stop": rows})
+        await db.commit()
+        await db.execute(text("ANALYZE alerts"))
+
+
+async def fetch_page(db, request: AlertRequestModel) -> int:
+    """One page through the same path as POST /alerts/search (raw JSONB text, streamed)."""
+    search = prepare_alert_search(BENCH_CUSTOMER_ID, request)
+    tail = {"nextPageToken": None}
+    rows = 0
+    async for batch in iter_alert_payloads(db, search, tail):
+        rows += len(batch)
+    return rows
+
+
+async def timed(coro_factory, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await coro_factory()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=600_000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    await seed(args.rows)
+    request = AlertRequestModel(limit=args.limit)
+    fingerprint = _query_fingerprint(BENCH_CUSTOMER_ID, request)
+    base_query = build_alert_query(BENCH_CUSTOMER_ID, request)
+
+    print(f"{'page':>6} {'keyset ms':>10} {'offset ms':>10}")
+    async with SessionLocal() as db:
+        for page in PAGES:
+            offset = (page - 1) * args.limit
+            if offset >= args.rows:
+                break
+            page_request = request
+            if page > 1:
+                # Locate the previous page's last row once (untimed) to build its token
+                boundary = (await db.execute(base_query.offset(offset - 1).limit(1))).one()
+                page_request = request.model_copy(update={
+                    "pageToken": encode_page_token(boundary.alert_time, boundary.id, fingerprint)
+                })
+            keyset_ms = await timed(lambda: fetch_page(db, page_request), args.repeat)
+            offset_ms = await timed(lambda: db.execute(base_query.offset(offset).limit(args.limit)), args.repeat)
+            print(f"{page:>6} {keyset_ms:>10.2f} {offset_ms:>10.2f}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
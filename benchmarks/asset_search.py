@@ -0,0 +1,128 @@
+"""Asset search latency: full-table filtering vs GIN/btree indexes vs the bitmap index.
+
+Seeds one tenant with --rows synthetic assets (skipped if already seeded)
+against DATABASE_URL, then times a set of conjunctive filters three ways:
+
+    python benchmarks/asset_search.py --rows 1000000
+
+- scan:     the search SQL with index and bitmap scans disabled, i.e. what
+            filtering cost before the search indexes existed
+- postgres: the same SQL using the GIN/btree indexes on assets
+- bitmap:   the in-process TenantIndex (ids) plus one payload fetch per page
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, select, text
+from database import SessionLocal, engine
+from models.asset_record import AssetRecord
+from models.base import Base
+from schemas.asset import AssetSearchRequestModel
+from utils import asset_search
+
+BENCH_CUSTOMER_ID = uuid.UUID("00000000-0000-0000-0000-0000000a55e7")
+
+QUERIES = {
+    "risk F + aws": AssetSearchRequestModel(riskGrade=["F"], cloudType=["aws"]),
+    "tag env=prod + 2 services": AssetSearchRequestModel(tags={"env": "prod"}, serviceName=["svc-3", "svc-7"]),
+    "single ip": AssetSearchRequestModel(ipAddresses=["10.1.2.3"]),
+    "vpc + class + tag key": AssetSearchRequestModel(vpcExternalAssetId=["vpc-42"], assetClass=["compute"],
+                                                     tags={"owner": None}),
+    "risk A|B + prod, page 2": AssetSearchRequestModel(riskGrade=["A", "B"], tags={"env": "prod"},
+                                                       after="asset-0000500000"),
+}
+
+
+async def seed(rows: int) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=[AssetRecord.__table__])
+    async with SessionLocal() as db:
+        existing = (await db.execute(
+            select(func.count()).select_from(AssetRecord).where(AssetRecord.customer_id == BENCH_CUSTOMER_ID)
+        )).scalar_one()
+        if existing >= rows:
+            return
+        await db.execute(text("""
+            INSERT INTO assets (id, customer_id, external_asset_id, asset_id, name, cloud_type, asset_type,
+                                asset_class, service_name, resource_type, region_id, risk_grade,
+                                vpc_external_asset_id, account_name, tags, ip_addresses, deleted,
+                                created_ts, insert_ts, payload, updated_at)
+            SELECT gen_random_uuid(), :customer_id, 'asset-' || lpad(g::text, 10, '0'), 'id-' || g, 'asset ' || g,
+                   (ARRAY['aws','gcp','azure'])[1 + g % 3], 'instance',
+                   (ARRAY['compute','network','storage','identity'])[1 + g % 4], 'svc-' || (g % 50), 'resource',
+                   'region-' || (g % 12), (ARRAY['A','B','C','D','F'])[1 + (g * 7) % 5], 'vpc-' || (g % 1000),
+                   'account-' || (g % 30),
+                   jsonb_build_object('env', (ARRAY['prod','dev','staging'])[1 + g % 3], 'team', 'team-' || (g % 25))
+                       || CASE WHEN g % 10 = 0 THEN jsonb_build_object('owner', 'user-' || (g % 500)) ELSE '{}' END,
+                   ARRAY['10.' || (g / 65536 % 256) || '.' || (g / 256 % 256) || '.' || (g % 256)],
+                   false, now(), now(), jsonb_build_object('externalAssetId', 'asset-' || lpad(g::text, 10, '0')), 0
+            FROM generate_series(:start, :stop) AS g
+            ON CONFLICT DO NOTHING
+        """), {"customer_id": BENCH_CUSTOMER_ID, "start": existing + 1, "stop": rows})
+        await db.commit()
+        await db.execute(text("ANALYZE assets"))
+
+
+async def timed(coro_factory, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await coro_factory()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+async def full_scan(db, request):
+    async with db.begin():
+        await db.execute(text("SET LOCAL enable_indexscan = off"))
+        await db.execute(text("SET LOCAL enable_bitmapscan = off"))
+        await db.execute(text("SET LOCAL enable_indexonlyscan = off"))
+        return (await db.execute(asset_search.build_asset_search_query(BENCH_CUSTOMER_ID, request))).all()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    await seed(args.rows)
+    async with SessionLocal() as db:
+        started = time.perf_counter()
+        index = await asset_search.asset_index.build(db, BENCH_CUSTOMER_ID)
+        print(f"bitmap index: {len(index.ids)} assets, {len(index.postings)} terms, "
+              f"built in {time.perf_counter() - started:.1f}s")
+
+    print(f"{'query':<28} {'matches':>9} {'scan ms':>9} {'postgres ms':>12} {'bitmap ms':>10} {'index-only ms':>14}")
+    for name, request in QUERIES.items():
+        request = request.model_copy(update={"limit": args.limit})
+        groups = asset_search.request_groups(request)
+        _, total = index.query(groups, request.after, request.limit)
+
+        async with SessionLocal() as db:
+            scan_ms = await timed(lambda: full_scan(db, request), args.repeat)
+        async with SessionLocal() as db:
+            asset_search.ASSET_BITMAP_INDEX = False
+            postgres_ms = await timed(lambda: asset_search.search_assets(db, BENCH_CUSTOMER_ID, request), args.repeat)
+            # Serve the prebuilt index instead of waiting for a background build
+            asset_search.ASSET_BITMAP_INDEX = True
+            asset_search.asset_index._tenants[BENCH_CUSTOMER_ID] = (time.monotonic(), index)
+            bitmap_ms = await timed(lambda: asset_search.search_assets(db, BENCH_CUSTOMER_ID, request), args.repeat)
+
+        async def index_only():
+            index.query(groups, request.after, request.limit)
+        index_ms = await timed(index_only, args.repeat)
+        print(f"{name:<28} {total:>9} {scan_ms:>9.2f} {postgres_ms:>12.2f} {bitmap_ms:>10.2f} {index_ms:>14.3f}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
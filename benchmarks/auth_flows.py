@@ -0,0 +1,387 @@
+"""Load test for the customer and consultant auth flows, with a regression gate.
+
+Boots the app from main.py in-process against DATABASE_URL, with a local
+SMTP sink (aiosmtpd) that captures the OTP emails and a stubbed SAML IdP,
+then runs concurrent virtual users through the full flow:
+
+    /request-otp -> /verify-otp -> /verify-totp      (MFA enrolment)
+    /request-otp -> /mfa-login -> /me                (login with OTP + TOTP)
+
+plus /signup/ and the consultant SSO round trip (/request-otp -> /sso/acs/).
+OTPs go through the deployed default store (pending_otps in the database),
+so its statements count towards the query budgets.
+
+    python benchmarks/auth_flows.py --users 20 --iterations 5
+    python benchmarks/auth_flows.py --update-baseline
+
+Throughput, p50/p95/p99 per endpoint and SQL statements per request are
+compared with benchmarks/auth_flows_baseline.json. The run exits non-zero
+when p95 or throughput regress by more than --threshold, or when an
+endpoint exceeds its query budget. It also fails when the baseline has no
+p95/throughput reference or was recorded with different load parameters.
+
+Latency depends on the machine, so the baseline is recorded where the gate
+runs: the manual `auth-flows-baseline` CI job runs --update-baseline and
+publishes the file as an artifact to commit.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SMTP_SINK_PORT = int(os.getenv("BENCH_SMTP_PORT", "8025"))
+
+# Must be set before the app is imported: the modules read them at import time
+os.environ.update({
+    "METRICS_ENABLED": "true",
+    "SMTP_HOST": "127.0.0.1",
+    "SMTP_PORT": str(SMTP_SINK_PORT),
+    "SMTP_STARTTLS": "false",
+    "SMTP_USERNAME": "",
+    "SMTP_PASSWORD": "",
+    "OUTBOX_POLL_INTERVAL_SECONDS": "0.05",
+    "OTP_TEMPLATE_NAME": "bench_otp_verification",
+    "WELCOME_TEMPLATE_NAME": "bench_welcome_email",
+    # The IdP stub replaces run_acs in this process, so the ACS pool must be threads
+    "SAML_ACS_EXECUTOR": "thread",
+})
+# Every virtual user shares the in-process client address
+os.environ.setdefault("OTP_RATE_LIMIT_IP", "1000000/1")
+os.environ.setdefault("SSO_SESSION_BACKEND", "memory")
+
+import httpx
+import pyotp
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert
+from main import app
+from database import SessionLocal, engine
+from models.base import Base
+from models.consultant import Consultant
+from models.customer import Customer
+from models.email import EmailLog, EmailTemplate
+from models.pending_otp import PendingOTP
+from routers import auth_service
+from utils import saml_executor
+from utils.metrics import histogram_totals, http_request_queries
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "auth_flows_baseline.json")
+OTP_PATTERN = re.compile(r"BENCH-OTP:(\S+)")
+BENCH_TEMPLATES = {
+    "bench_otp_verification": ("Your code", "BENCH-OTP:{{ otp }}"),
+    "bench_welcome_email": ("Welcome", "Verify with {{ token }}"),
+}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Mailbox:
+    """OTP codes captured by the SMTP sink, handed to the event loop per recipient."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self._queues = {}
+
+    def _queue(self, email: str) -> asyncio.Queue:
+        return self._queues.setdefault(email.lower(), asyncio.Queue())
+
+    def deliver(self, recipients, body: str) -> None:
+        # Called on the sink's thread
+        match = OTP_PATTERN.search(body)
+        if match:
+            for email in recipients:
+                self._loop.call_soon_threadsafe(self._queue(email).put_nowait, match.group(1))
+
+    async def wait(self, email: str, timeout: float = 10.0) -> str:
+        return await asyncio.wait_for(self._queue(email).get(), timeout)
+
+
+class SinkHandler:
+    def __init__(self, mailbox: Mailbox):
+        self.mailbox = mailbox
+
+    async def handle_DATA(self, server, session, envelope):
+        from email import message_from_bytes
+        message = message_from_bytes(envelope.original_content or envelope.content)
+        parts = message.walk() if message.is_multipart() else [message]
+        body = "".join(part.get_payload(decode=True).decode(errors="replace")
+                       for part in parts if not part.is_multipart())
+        self.mailbox.deliver(envelope.rcpt_tos, body)
+        return "250 OK"
+
+
+class StubSamlAuth:
+    """Stands in for OneLogin_Saml2_Auth on the SSO redirect."""
+
+    def __init__(self):
+        self._request_id = f"ONELOGIN_{uuid.uuid4().hex}"
+
+    def login(self) -> str:
+        return f"https://idp.bench.invalid/sso?request={self._request_id}"
+
+    def get_last_request_id(self) -> str:
+        return self._request_id
+
+
+async def stub_init_saml_auth(request):
+    return StubSamlAuth()
+
+
+def stub_run_acs(req: dict) -> saml_executor.AcsResult:
+    """The IdP's answer: the benchmark posts "<request id>|<email>" as the SAMLResponse."""
+    request_id, email = req["post_data"]["SAMLResponse"].split("|", 1)
+    return saml_executor.AcsResult(
+        errors=[], error_reason=None, authenticated=True,
+        attributes={
+            "http://schemas.xmlsoap.org/ws/2005/05/identity/claims/emailaddress": [email],
+            "http://schemas.microsoft.com/identity/claims/displayname": ["Bench Consultant"],
+            "http://schemas.microsoft.com/identity/claims/objectidentifier": [str(uuid.uuid4())],
+        },
+        in_response_to=request_id, started_at=time.time(),
+    )
+
+
+def customer_email(index: int) -> str:
+    return f"bench-user-{index}@example.com"
+
+
+async def seed(customers: int) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=[
+            Customer.__table__, Consultant.__table__, EmailTemplate.__table__, EmailLog.__table__,
+            PendingOTP.__table__,
+        ])
+    now = int(time.time())
+    async with SessionLocal() as db:
+        existing = set((await db.execute(
+            select(EmailTemplate.template_name).where(EmailTemplate.template_name.in_(BENCH_TEMPLATES))
+        )).scalars())
+        for name, (subject, body) in BENCH_TEMPLATES.items():
+            if name not in existing:
+                db.add(EmailTemplate(template_name=name, subject=subject, body=body, created_at=now, updated_at=now))
+        emails = [customer_email(i) for i in range(customers)]
+        stmt = insert(Customer).values([
+            {"id": uuid.uuid4(), "customer_email": email, "customer_name": "Bench", "customer_status": "APPROVED",
+             "customer_email_verified": True, "is_mfa_enabled": False, "assigned_consultant_ids": []}
+            for email in emails
+        ])
+        await db.execute(stmt.on_conflict_do_nothing(index_elements=["customer_email"]))
+        # Every run starts from un-enrolled customers
+        await db.execute(
+            update(Customer).where(Customer.customer_email.in_(emails))
+            .values(customer_status="APPROVED", is_mfa_enabled=False, mfa_secret=None, mfa_last_totp_step=None)
+        )
+        await db.execute(delete(PendingOTP).where(PendingOTP.email.in_(emails)))
+        await db.commit()
+
+
+async def load_secret(email: str) -> str:
+    async with SessionLocal() as db:
+        return (await db.execute(select(Customer.mfa_secret).where(Customer.customer_email == email))).scalar_one()
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+
+    async def call(self, client: httpx.AsyncClient, name: str, method: str, url: str, **kwargs) -> httpx.Response:
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.latencies.setdefault(name, []).append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            self.errors[name] = self.errors.get(name, 0) + 1
+            raise RuntimeError(f"{name} -> {response.status_code}: {response.text[:200]}")
+        return response
+
+
+async def customer_flow(client, recorder: Recorder, mailbox: Mailbox, email: str) -> None:
+    requested = time.perf_counter()
+    await recorder.call(client, "POST /request-otp", "POST", "/request-otp", json={"email": email})
+    code = await mailbox.wait(email)
+    recorder.latencies.setdefault("otp delivery", []).append(time.perf_counter() - requested)
+    await recorder.call(client, "POST /verify-otp", "POST", "/verify-otp", json={"email": email, "otp": code})
+
+    totp = pyotp.TOTP(await load_secret(email))
+    await recorder.call(client, "POST /verify-totp", "POST", "/verify-totp", json={"email": email, "totp": totp.now()})
+
+    await recorder.call(client, "POST /request-otp", "POST", "/request-otp", json={"email": email})
+    code = await mailbox.wait(email)
+    # The enrolment step was just used; the next step is still inside the validity window
+    response = await recorder.call(client, "POST /mfa-login", "POST", "/mfa-login", json={
+        "email": email, "otp": code, "totp": totp.at(time.time() + totp.interval),
+    })
+    token = response.json()["access_token"]
+    await recorder.call(client, "GET /me", "GET", "/me", headers={"Authorization": f"Bearer {token}"})
+
+
+async def signup_flow(client, recorder: Recorder, run_id: str, index: int) -> None:
+    await recorder.call(client, "POST /signup/", "POST", "/signup/", json={
+        "customer_email": f"bench-signup-{run_id}-{index}@example.com", "customer_name": "Bench",
+    })
+
+
+async def consultant_flow(client, recorder: Recorder, run_id: str, index: int) -> None:
+    email = f"bench-{run_id}-{index}@esecforte.com"
+    response = await recorder.call(client, "POST /request-otp", "POST", "/request-otp", json={"email": email})
+    request_id = response.json()["sso_redirect_url"].rsplit("=", 1)[1]
+    await recorder.call(client, "POST /sso/acs/", "POST", "/sso/acs/", data={"SAMLResponse": f"{request_id}|{email}"})
+
+
+async def run(args) -> dict:
+    loop = asyncio.get_running_loop()
+    mailbox = Mailbox(loop)
+    from aiosmtpd.controller import Controller
+    sink = Controller(SinkHandler(mailbox), hostname="127.0.0.1", port=SMTP_SINK_PORT)
+    sink.start()
+
+    auth_service.init_saml_auth = stub_init_saml_auth
+    saml_executor.run_acs = stub_run_acs
+    await seed(args.users * args.iterations)
+
+    recorder = Recorder()
+    run_id = uuid.uuid4().hex[:8]
+    failures = []
+    semaphore = asyncio.Semaphore(args.users)
+
+    async def guarded(coro):
+        async with semaphore:
+            try:
+                await coro
+            except Exception as e:
+                failures.append(str(e))
+
+    await app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=30) as client:
+            started = time.perf_counter()
+            # Each customer logs in once: TOTP replay protection rejects a reused step
+            flows = [customer_flow(client, recorder, mailbox, customer_email(i))
+                     for i in range(args.users * args.iterations)]
+            flows += [signup_flow(client, recorder, run_id, i) for i in range(args.signups)]
+            flows += [consultant_flow(client, recorder, run_id, i) for i in range(args.consultants)]
+            await asyncio.gather(*(guarded(flow) for flow in flows))
+            elapsed = time.perf_counter() - started
+    finally:
+        await app.router.shutdown()
+        sink.stop()
+
+    queries = {f"{method} {route}": total / count
+               for (method, route), (count, total) in histogram_totals(http_request_queries).items() if count}
+    requests = sum(len(samples) for name, samples in recorder.latencies.items() if name != "otp delivery")
+    return {
+        "flows": len(flows) - len(failures),
+        "failures": failures,
+        "seconds": elapsed,
+        "throughput_rps": requests / elapsed,
+        "endpoints": {
+            name: {
+                "requests": len(samples),
+                "errors": recorder.errors.get(name, 0),
+                "p50_ms": statistics.median(samples) * 1000,
+                "p95_ms": percentile(samples, 95) * 1000,
+                "p99_ms": percentile(samples, 99) * 1000,
+                "queries_per_request": queries.get(name),
+            }
+            for name, samples in sorted(recorder.latencies.items())
+        },
+    }
+
+
+def run_parameters(args) -> dict:
+    """The load shape; p95 and throughput are only comparable between runs with the same one."""
+    return {"users": args.users, "iterations": args.iterations, "signups": args.signups,
+            "consultants": args.consultants}
+
+
+def compare(result: dict, baseline: dict, threshold: float, parameters: dict) -> list:
+    # An empty or mismatched baseline fails the gate instead of silently checking nothing
+    if not baseline.get("endpoints") or not baseline.get("throughput_rps"):
+        return ["baseline has no p95/throughput reference; record one with --update-baseline"]
+    if baseline.get("parameters") != parameters:
+        return [f"baseline was recorded with {baseline.get('parameters')}, this run used {parameters}"]
+    regressions = []
+    for name, budget in baseline.get("query_budgets", {}).items():
+        measured = result["endpoints"].get(name, {}).get("queries_per_request")
+        if measured is not None and measured > budget:
+            regressions.append(f"{name}: {measured:.2f} queries/request exceeds the budget of {budget}")
+    for name in result["endpoints"].keys() - baseline["endpoints"].keys():
+        regressions.append(f"{name}: no baseline p95; record one with --update-baseline")
+    for name, reference in baseline["endpoints"].items():
+        measured = result["endpoints"].get(name)
+        if not measured:
+            regressions.append(f"{name}: in the baseline but not exercised by this run")
+        elif measured["p95_ms"] > reference["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {measured['p95_ms']:.1f}ms vs baseline {reference['p95_ms']:.1f}ms")
+    reference_rps = baseline["throughput_rps"]
+    if result["throughput_rps"] < reference_rps * (1 - threshold):
+        regressions.append(f"throughput {result['throughput_rps']:.1f} req/s vs baseline {reference_rps:.1f} req/s")
+    return regressions
+
+
+def report(result: dict) -> None:
+    print(f"{result['flows']} flows in {result['seconds']:.1f}s, {result['throughput_rps']:.1f} req/s, "
+          f"{len(result['failures'])} failed")
+    print(f"{'endpoint':<20} {'n':>6} {'err':>4} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8}")
+    for name, stats in result["endpoints"].items():
+        queries = stats["queries_per_request"]
+        print(f"{name:<20} {stats['requests']:>6} {stats['errors']:>4} {stats['p50_ms']:>8.1f} "
+              f"{stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f} {'-' if queries is None else f'{queries:.2f}':>8}")
+    for failure in result["failures"][:10]:
+        print(f"  failed: {failure}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--iterations", type=int, default=5, help="customer flows per virtual user")
+    parser.add_argument("--signups", type=int, default=50)
+    parser.add_argument("--consultants", type=int, default=10)
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed p95/throughput regression")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--output", help="also write the raw results as JSON")
+    args = parser.parse_args()
+
+    result = await run(args)
+    await engine.dispose()
+    report(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if args.update_baseline:
+        if result["failures"]:
+            print("not updating the baseline: some flows failed")
+            return 1
+        baseline["parameters"] = run_parameters(args)
+        baseline["throughput_rps"] = result["throughput_rps"]
+        baseline["endpoints"] = {name: {"p95_ms": stats["p95_ms"]} for name, stats in result["endpoints"].items()}
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+            f.write("\n")
+        print(f"baseline written to {args.baseline}")
+        return 0
+
+    regressions = compare(result, baseline, args.threshold, run_parameters(args))
+    if result["failures"]:
+        regressions.append(f"{len(result['failures'])} flows failed")
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,140 @@
+"""Time-to-first-byte and peak server RSS for a large asset list response.
+
+Seeds the asset search tenant (benchmarks/asset_search.py) with --rows assets
+against DATABASE_URL, then starts a uvicorn worker per mode and fetches
+--rows assets in one response:
+
+    python benchmarks/list_streaming.py --rows 100000
+
+- streamed: GET /customers/{id}/assets, encoded with orjson from the query
+            rows and streamed in chunks (utils.json_stream)
+- buffered: the same rows loaded in full, turned into dicts and returned
+            through FastAPI's default JSON response, i.e. the old list path
+
+Peak RSS is the worker's VmHWM from /proc, so this needs Linux.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+BUFFERED_PATH = "/bench/buffered/customers/{customer_id}/assets"
+
+
+def serve(mode: str, port: int) -> None:
+    import uvicorn
+    from fastapi import Depends, Query
+    from sqlalchemy import select
+    from database import get_read_db
+    from main import app
+    from models.asset_record import AssetRecord
+    from utils.alert_rollup import load_alert_counts
+    from utils.json_stream import epoch_millis
+
+    if mode == "buffered":
+        @app.get(BUFFERED_PATH)
+        async def buffered_assets(customer_id: uuid.UUID, limit: int = Query(100), db=Depends(get_read_db)):
+            rows = (await db.execute(
+                select(AssetRecord.external_asset_id, AssetRecord.created_ts, AssetRecord.insert_ts,
+                       AssetRecord.payload)
+                .where(AssetRecord.customer_id == customer_id, AssetRecord.deleted.is_(False))
+                .order_by(AssetRecord.external_asset_id)
+                .limit(limit)
+            )).all()
+            counts = await load_alert_counts(db, customer_id, (row.external_asset_id for row in rows))
+            items = []
+            for row in rows:
+                asset = dict(row.payload)
+                asset["createdTs"], asset["insertTs"] = epoch_millis(row.created_ts), epoch_millis(row.insert_ts)
+                asset["alertsCount"] = asset["alertCountBySeverity"] = counts[row.external_asset_id]
+                items.append(asset)
+            return {"items": items, "next": rows[-1].external_asset_id if len(rows) == limit else None}
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def peak_rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+async def wait_ready(client: httpx.AsyncClient, process: subprocess.Popen, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with {process.returncode}")
+        try:
+            await client.get("/")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError("server did not become ready")
+
+
+async def measure(mode: str, args, token: str) -> dict:
+    from benchmarks.asset_search import BENCH_CUSTOMER_ID
+
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", mode, "--port", str(args.port)])
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=300) as client:
+            await wait_ready(client, process)
+            path = BUFFERED_PATH if mode == "buffered" else "/customers/{customer_id}/assets"
+            url = path.format(customer_id=BENCH_CUSTOMER_ID)
+            ttfb, total, size = [], [], 0
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                first = None
+                size = 0
+                async with client.stream("GET", url, params={"limit": args.rows},
+                                         headers={"Authorization": f"Bearer {token}"}) as response:
+                    response.raise_for_status()
+                    async for chunk in response.aiter_raw():
+                        if first is None:
+                            first = time.perf_counter() - started
+                        size += len(chunk)
+                ttfb.append(first)
+                total.append(time.perf_counter() - started)
+            return {"ttfb_ms": min(ttfb) * 1000, "total_ms": min(total) * 1000,
+                    "body_mb": size / 2 ** 20, "peak_rss_mb": peak_rss_mb(process.pid)}
+    finally:
+        process.terminate()
+        process.wait()
+
+
+async def main(args):
+    from auth.tokens import create_token
+    from benchmarks.asset_search import seed
+    from database import engine
+    await seed(args.rows)
+    await engine.dispose()
+    token = create_token({"sub": "bench-list-streaming@example.com"})
+
+    print(f"{'mode':<10} {'ttfb ms':>9} {'total ms':>10} {'body MB':>9} {'peak RSS MB':>12}")
+    for mode in ("buffered", "streamed"):
+        result = await measure(mode, args, token)
+        print(f"{mode:<10} {result['ttfb_ms']:>9.1f} {result['total_ms']:>10.1f} "
+              f"{result['body_mb']:>9.1f} {result['peak_rss_mb']:>12.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8765)
+    # Internal: run one server worker for measure()
+    parser.add_argument("--serve", choices=("streamed", "buffered"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args.serve, args.port)
+    else:
+        asyncio.run(main(args))
@@ -0,0 +1,106 @@
+"""Worker startup: import time per module and time until the app serves requests.
+
+    python benchmarks/startup.py --budget 5
+
+- import profile: `python -X importtime -c "import main"`, reported as the
+  slowest modules (cumulative) and self time summed per top-level package
+- lazy imports:   fails if importing main pulled in a module from
+                  LAZY_MODULES (SAML/xmlsec, TOTP, QR rendering), which
+                  should only load on first use
+- time to ready:  median over --repeat runs of spawning a uvicorn worker
+                  until GET / answers, checked against --budget seconds
+
+Exits non-zero when the budget is exceeded or a lazy module is imported.
+"""
+import argparse
+import collections
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STARTUP_READY_BUDGET_SECONDS = float(os.getenv("STARTUP_READY_BUDGET_SECONDS", "5"))
+LAZY_MODULES = ("onelogin", "xmlsec", "pyotp", "qrcode", "PIL")
+
+
+def import_profile():
+    """[(module, self_us, cumulative_us)] for `import main`, in import order."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=ROOT,
+                            capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(f"import main failed:\n{result.stderr[-2000:]}")
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+def time_to_ready(port: int, timeout: float = 60) -> float:
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+                                "--log-level", "warning"], cwd=ROOT)
+    try:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"worker exited with {process.returncode}")
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                    return time.perf_counter() - started
+            except httpx.TransportError:
+                pass
+            time.sleep(0.02)
+        raise RuntimeError("worker did not become ready")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=STARTUP_READY_BUDGET_SECONDS,
+                        help="seconds a new worker may take to serve its first request")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    modules = import_profile()
+    total_us = sum(self_us for _, self_us, _ in modules)
+    print(f"import main: {total_us / 1000:.1f} ms across {len(modules)} modules\n")
+    print(f"{'module':<50} {'self ms':>9} {'cumulative ms':>14}")
+    for name, self_us, cumulative_us in sorted(modules, key=lambda module: -module[2])[:args.top]:
+        print(f"{name:<50} {self_us / 1000:>9.1f} {cumulative_us / 1000:>14.1f}")
+
+    packages = collections.Counter()
+    for name, self_us, _ in modules:
+        packages[name.split(".", 1)[0]] += self_us
+    print(f"\n{'package':<30} {'self ms':>9}")
+    for package, self_us in packages.most_common(args.top):
+        print(f"{package:<30} {self_us / 1000:>9.1f}")
+
+    failures = []
+    eager = sorted({name for name, _, _ in modules if name.split(".", 1)[0] in LAZY_MODULES})
+    if eager:
+        failures.append(f"imported at startup but should be lazy: {', '.join(eager)}")
+
+    samples = [time_to_ready(args.port) for _ in range(args.repeat)]
+    ready = statistics.median(samples)
+    print(f"\ntime to ready: median {ready:.2f}s, max {max(samples):.2f}s (budget {args.budget:.2f}s)")
+    if ready > args.budget:
+        failures.append(f"time to ready {ready:.2f}s exceeds the budget of {args.budget:.2f}s")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
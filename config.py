@@ -9,3 +9,6 @@ REDIRECT_URI = "http://127.0.0.1:5000/getToken"
 AUTHORIZATION_URL = f"https://login.microsoftonline.com/{TENANT_ID}/oauth2/v2.0/authorize"
 TOKEN_URL = f"https://login.microsoftonline.com/{TENANT_ID}/oauth2/v2.0/token"
 JWKS_URL = f"https://login.microsoftonline.com/{TENANT_ID}/discovery/v2.0/keys"
+
+# uvicorn --workers and gunicorn -w both default to WEB_CONCURRENCY
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY") or "1")
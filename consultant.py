@@ -13,7 +13,8 @@ class Consultant(Base):
     __tablename__ = "consultants"
 
     id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
-    azure_id: Mapped[str] = mapped_column(String, nullable=False)
+    # Azure AD object id (oid); what consultant tokens are authorized by
+    azure_id: Mapped[str] = mapped_column(String, nullable=False, index=True)
     display_name: Mapped[str] = mapped_column(String, nullable=False)
     mail: Mapped[str] = mapped_column(String, nullable=False)
     mobile_phone: Mapped[str] = mapped_column(String, nullable=True)
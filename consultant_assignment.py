@@ -0,0 +1,7 @@
+import uuid
+from typing import List
+from pydantic import BaseModel
+
+
+class ConsultantAssignmentRequestModel(BaseModel):
+    customerIds : List[uuid.UUID]
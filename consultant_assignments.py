@@ -0,0 +1,175 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import delete, func, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.customer import Customer
+from models.customer_consultant import CustomerConsultant
+from utils.customer_cache import invalidate_customer
+
+CONSULTANT_CUSTOMERS_CACHE_TTL_SECONDS = int(os.getenv("CONSULTANT_CUSTOMERS_CACHE_TTL_SECONDS", "60"))
+CONSULTANT_CUSTOMERS_CACHE_MAX_ENTRIES = int(os.getenv("CONSULTANT_CUSTOMERS_CACHE_MAX_ENTRIES", "1000"))
+
+_EMPTY_ARRAY = text("'{}'::varchar[]")
+
+
+class ConsultantCustomersCache:
+    """LRU of consultant id -> assigned customer summaries, with a TTL per entry."""
+
+    def __init__(self, ttl: float = CONSULTANT_CUSTOMERS_CACHE_TTL_SECONDS,
+                 max_entries: int = CONSULTANT_CUSTOMERS_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[uuid.UUID, tuple[float, List[dict]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def peek(self, consultant_id: uuid.UUID) -> Optional[List[dict]]:
+        with self._lock:
+            entry = self._entries.get(consultant_id)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[consultant_id]
+                return None
+            self._entries.move_to_end(consultant_id)
+            return entry[1]
+
+    def put(self, consultant_id: uuid.UUID, customers: List[dict]) -> None:
+        with self._lock:
+            self._entries[consultant_id] = (time.monotonic() + self.ttl, customers)
+            self._entries.move_to_end(consultant_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, consultant_id: uuid.UUID) -> None:
+        with self._lock:
+            self._entries.pop(consultant_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+consultant_customers_cache = ConsultantCustomersCache()
+
+
+async def get_consultant_customers(db: AsyncSession, consultant_id: uuid.UUID) -> List[dict]:
+    """Customers assigned to a consultant, read through the join table's consultant_id index."""
+    customers = consultant_customers_cache.peek(consultant_id)
+    if customers is not None:
+        return customers
+    result = await db.execute(
+        select(Customer.id, Customer.customer_name, Customer.customer_email, Customer.customer_company_name,
+               Customer.customer_status)
+        .join(CustomerConsultant, CustomerConsultant.customer_id == Customer.id)
+        .where(CustomerConsultant.consultant_id == consultant_id)
+        .order_by(Customer.customer_name, Customer.id)
+    )
+    customers = [
+        {
+            "id": str(row.id),
+            "customer_name": row.customer_name,
+            "customer_email": row.customer_email,
+            "customer_company_name": row.customer_company_name,
+            "customer_status": getattr(row.customer_status, "value", row.customer_status),
+        }
+        for row in result
+    ]
+    consultant_customers_cache.put(consultant_id, customers)
+    return customers
+
+
+async def _existing_customer_ids(db: AsyncSession, customer_ids: Iterable[uuid.UUID]) -> List[uuid.UUID]:
+    result = await db.execute(select(Customer.id).where(Customer.id.in_(set(customer_ids))))
+    # Sorted so concurrent bulk calls lock customer rows in the same order
+    return sorted(result.scalars())
+
+
+async def assign_customers(db: AsyncSession, consultant_id: uuid.UUID,
+                           customer_ids: Iterable[uuid.UUID]) -> Dict[str, object]:
+    """Assign customers to a consultant in one transaction; already-assigned ones are left alone."""
+    customer_ids = list(customer_ids)
+    existing = await _existing_customer_ids(db, customer_ids)
+    assigned: List[uuid.UUID] = []
+    if existing:
+        now = int(time.time())
+        result = await db.execute(
+            insert(CustomerConsultant)
+            .values([{"consultant_id": consultant_id, "customer_id": customer_id, "assigned_at": now}
+                      for customer_id in existing])
+            .on_conflict_do_nothing()
+            .returning(CustomerConsultant.customer_id)
+        )
+        assigned = list(result.scalars())
+    emails = []
+    if assigned:
+        # Keep the legacy array column in step for code that still reads it
+        consultant = str(consultant_id)
+        current = func.coalesce(Customer.assigned_consultant_ids, _EMPTY_ARRAY)
+        result = await db.execute(
+            update(Customer)
+            .where(Customer.id.in_(assigned))
+            .values(assigned_consultant_ids=func.array_append(func.array_remove(current, consultant), consultant))
+            .returning(Customer.customer_email)
+        )
+        emails = list(result.scalars())
+    await db.commit()
+    _invalidate(consultant_id, emails)
+    missing = set(customer_ids) - set(existing)
+    return {"assigned": len(assigned), "unchanged": len(existing) - len(assigned),
+            "missing": sorted(str(customer_id) for customer_id in missing)}
+
+
+async def unassign_customers(db: AsyncSession, consultant_id: uuid.UUID,
+                             customer_ids: Iterable[uuid.UUID]) -> Dict[str, int]:
+    customer_ids = sorted(set(customer_ids))
+    removed: List[uuid.UUID] = []
+    if customer_ids:
+        result = await db.execute(
+            delete(CustomerConsultant)
+            .where(CustomerConsultant.consultant_id == consultant_id,
+                   CustomerConsultant.customer_id.in_(customer_ids))
+            .returning(CustomerConsultant.customer_id)
+        )
+        removed = list(result.scalars())
+    emails = []
+    if removed:
+        result = await db.execute(
+            update(Customer)
+            .where(Customer.id.in_(removed))
+            .values(assigned_consultant_ids=func.array_remove(Customer.assigned_consultant_ids, str(consultant_id)))
+            .returning(Customer.customer_email)
+        )
+        emails = list(result.scalars())
+    await db.commit()
+    _invalidate(consultant_id, emails)
+    return {"unassigned": len(removed), "unchanged": len(customer_ids) - len(removed)}
+
+
+def _invalidate(consultant_id: uuid.UUID, emails: Iterable[str]) -> None:
+    consultant_customers_cache.invalidate(consultant_id)
+    for email in emails:
+        invalidate_customer(email)
+
+
+# Array entries that are not the id of an existing consultant are skipped
+_BACKFILL_SQL = text("""
+    INSERT INTO customer_consultants (consultant_id, customer_id, assigned_at)
+    SELECT consultants.id, customers.id, EXTRACT(EPOCH FROM now())::int
+    FROM customers
+    CROSS JOIN LATERAL unnest(customers.assigned_consultant_ids) AS assigned(consultant_id)
+    JOIN consultants ON consultants.id::text = assigned.consultant_id
+    ON CONFLICT DO NOTHING
+""")
+
+
+async def backfill_assignments(db: AsyncSession) -> int:
+    """Copy Customer.assigned_consultant_ids into the join table; safe to re-run."""
+    result = await db.execute(_BACKFILL_SQL)
+    await db.commit()
+    consultant_customers_cache.clear()
+    return result.rowcount
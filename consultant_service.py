@@ -0,0 +1,49 @@
+import uuid
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from auth.tenant_access import authorize_admin, authorize_consultant
+from auth.tokens import Principal
+from database import get_db, get_read_db
+from models.consultant import Consultant
+from schemas.consultant_assignment import ConsultantAssignmentRequestModel
+from utils.consultant_assignments import assign_customers, get_consultant_customers, unassign_customers
+
+router = APIRouter()
+
+
+async def _require_consultant(db: AsyncSession, consultant_id: uuid.UUID) -> None:
+    found = (await db.execute(select(Consultant.id).where(Consultant.id == consultant_id))).scalar_one_or_none()
+    if found is None:
+        raise HTTPException(status_code=404, detail="Consultant not found")
+
+
+@router.get("/consultants/{consultant_id}/customers")
+async def list_consultant_customers(
+    consultant_id: uuid.UUID,
+    db: AsyncSession = Depends(get_read_db),
+    principal: Principal = Depends(authorize_consultant),
+):
+    return {"items": await get_consultant_customers(db, consultant_id)}
+
+
+@router.post("/consultants/{consultant_id}/customers/assign")
+async def assign_consultant_customers(
+    consultant_id: uuid.UUID,
+    request: ConsultantAssignmentRequestModel,
+    db: AsyncSession = Depends(get_db),
+    principal: Principal = Depends(authorize_admin),
+):
+    await _require_consultant(db, consultant_id)
+    return await assign_customers(db, consultant_id, request.customerIds)
+
+
+@router.post("/consultants/{consultant_id}/customers/unassign")
+async def unassign_consultant_customers(
+    consultant_id: uuid.UUID,
+    request: ConsultantAssignmentRequestModel,
+    db: AsyncSession = Depends(get_db),
+    principal: Principal = Depends(authorize_admin),
+):
+    await _require_consultant(db, consultant_id)
+    return await unassign_customers(db, consultant_id, request.customerIds)
@@ -26,7 +26,7 @@ class Customer(Base):
     customer_address: Mapped[str] = mapped_column(String, nullable=True)
     customer_city: Mapped[str] = mapped_column(String, nullable=True)
     customer_state: Mapped[str] = mapped_column(String, nullable=True)
-    customer_email: Mapped[str] = mapped_column(String, nullable=False)
+    customer_email: Mapped[str] = mapped_column(String, nullable=False, unique=True, index=True)
     customer_company_name: Mapped[str] = mapped_column(String, nullable=True)
     customer_country: Mapped[str] = mapped_column(String, nullable=True)
     customer_plan_id: Mapped[str] = mapped_column(String, nullable=True)
@@ -53,5 +53,6 @@ class Customer(Base):
     selected_plan_status: Mapped[str] = mapped_column(String, nullable=True)
     is_mfa_enabled: Mapped[bool] = mapped_column(Boolean, default=False)
     mfa_secret: Mapped[str] = mapped_column(String, nullable=True)
+    mfa_last_totp_step: Mapped[int] = mapped_column(Integer, nullable=True)
     otp: Mapped[str] = mapped_column(String, nullable=True)
     otp_expires_at: Mapped[int] = mapped_column(Integer, nullable=True)
@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.customer import Customer
+
+CUSTOMER_CACHE_TTL_SECONDS = int(os.getenv("CUSTOMER_CACHE_TTL_SECONDS", "60"))
+CUSTOMER_CACHE_MAX_ENTRIES = int(os.getenv("CUSTOMER_CACHE_MAX_ENTRIES", "10000"))
+
+
+@dataclass(frozen=True)
+class CustomerAuth:
+    """The slice of a customer row that the auth endpoints need."""
+    id: uuid.UUID
+    email: str
+    status: str
+    is_mfa_enabled: bool
+    mfa_secret: Optional[str]
+    assigned_consultant_ids: List[str] = field(default_factory=list)
+    mfa_last_totp_step: Optional[int] = None
+
+
+# Only the projected columns are loaded, never the full (wide) customer row
+_AUTH_COLUMNS = (
+    Customer.id,
+    Customer.customer_email,
+    Customer.customer_status,
+    Customer.is_mfa_enabled,
+    Customer.mfa_secret,
+    Customer.assigned_consultant_ids,
+    Customer.mfa_last_totp_step,
+)
+
+
+def _to_auth(row) -> CustomerAuth:
+    status = row.customer_status
+    return CustomerAuth(
+        id=row.id,
+        email=row.customer_email,
+        status=status.value if hasattr(status, "value") else status,
+        is_mfa_enabled=bool(row.is_mfa_enabled),
+        mfa_secret=row.mfa_secret,
+        assigned_consultant_ids=list(row.assigned_consultant_ids or []),
+        mfa_last_totp_step=row.mfa_last_totp_step,
+    )
+
+
+class CustomerCache:
+    """Read-through LRU of CustomerAuth projections keyed by email, with a TTL per entry."""
+
+    def __init__(self, ttl: float = CUSTOMER_CACHE_TTL_SECONDS, max_entries: int = CUSTOMER_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple[float, CustomerAuth]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def peek(self, email: str) -> Optional[CustomerAuth]:
+        """Return the cached projection without falling back to the database."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None:
+                return None
+            expires_at, customer = entry
+            if expires_at <= now:
+                del self._entries[email]
+                return None
+            self._entries.move_to_end(email)
+            return customer
+
+    def put(self, customer: CustomerAuth) -> None:
+        with self._lock:
+            self._entries[customer.email] = (time.monotonic() + self.ttl, customer)
+            self._entries.move_to_end(customer.email)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, email: str) -> None:
+        with self._lock:
+            self._entries.pop(email, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    async def get(self, email: str, db: AsyncSession, refresh: bool = False) -> Optional[CustomerAuth]:
+        customer = None if refresh else self.peek(email)
+        if customer is not None:
+            self.hits += 1
+            return customer
+        self.misses += 1
+        result = await db.execute(select(*_AUTH_COLUMNS).where(Customer.customer_email == email))
+        row = result.one_or_none()
+        if row is None:
+            # Unknown emails are not cached so that a signup is visible immediately
+            return None
+        customer = _to_auth(row)
+        self.put(customer)
+        return customer
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+customer_cache = CustomerCache()
+
+
+async def get_customer_auth(email: str, db: AsyncSession, refresh: bool = False) -> Optional[CustomerAuth]:
+    return await customer_cache.get(email, db, refresh=refresh)
+
+
+def invalidate_customer(email: str) -> None:
+    customer_cache.invalidate(email)
@@ -0,0 +1,23 @@
+import uuid
+from sqlalchemy import ForeignKey, Index, Integer
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.orm import Mapped, mapped_column
+from models.base import Base
+
+
+class CustomerConsultant(Base):
+    """Consultant-to-customer assignment; Customer.assigned_consultant_ids is kept in sync as a copy."""
+    __tablename__ = "customer_consultants"
+
+    # consultant_id leads the primary key, so "customers of a consultant" is an index range scan
+    consultant_id: Mapped[uuid.UUID] = mapped_column(
+        PG_UUID(as_uuid=True), ForeignKey("consultants.id", ondelete="CASCADE"), primary_key=True
+    )
+    customer_id: Mapped[uuid.UUID] = mapped_column(
+        PG_UUID(as_uuid=True), ForeignKey("customers.id", ondelete="CASCADE"), primary_key=True
+    )
+    assigned_at: Mapped[int] = mapped_column(Integer, nullable=True)
+
+    __table_args__ = (
+        Index("ix_customer_consultants_customer_id", "customer_id"),
+    )
@@ -1,17 +1,170 @@
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+import asyncio
+import logging
 import os
+import threading
+import time
+from fastapi import Depends
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from dotenv import load_dotenv
 
 load_dotenv()
 
-password = os.getenv("DATABASE_URL")
-print(password)
-engine = create_async_engine(DATABASE_URL, echo=True)
+logger = logging.getLogger(__name__)
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+# Optional streaming replica; reads fall back to the primary when it lags or is unreachable
+READ_REPLICA_URL = os.getenv("READ_REPLICA_URL")
+
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# asyncpg prepared-statement cache per connection; set to 0 behind pgbouncer in transaction mode
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv("REPLICA_LAG_CHECK_INTERVAL", "5"))
+# The probe runs inline on a request; an unreachable replica costs that request at most this long
+REPLICA_PROBE_TIMEOUT_SECONDS = float(os.getenv("REPLICA_PROBE_TIMEOUT_SECONDS", "1"))
+# Empty disables the check (e.g. a SQLite stand-in for the replica)
+REPLICA_LAG_QUERY = os.getenv(
+    "REPLICA_LAG_QUERY",
+    "SELECT COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)",
+)
+
+
+class PoolStats:
+    """Time spent waiting for a pooled connection, per engine."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = {}
+        self.wait_seconds_total = {}
+        self.wait_seconds_max = {}
+
+    def record(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.checkouts[name] = self.checkouts.get(name, 0) + 1
+            self.wait_seconds_total[name] = self.wait_seconds_total.get(name, 0.0) + seconds
+            self.wait_seconds_max[name] = max(self.wait_seconds_max.get(name, 0.0), seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                name: {
+                    "checkouts": count,
+                    "wait_seconds_total": self.wait_seconds_total[name],
+                    "wait_seconds_max": self.wait_seconds_max[name],
+                }
+                for name, count in self.checkouts.items()
+            }
+
+
+pool_stats = PoolStats()
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_stats.record(self._orig_logging_name or "primary", time.perf_counter() - started)
+
+
+def _engine_kwargs(name: str, url: str) -> dict:
+    kwargs = {"echo": DB_ECHO, "pool_pre_ping": DB_POOL_PRE_PING, "pool_logging_name": name}
+    if url.startswith("sqlite") and ":memory:" in url:
+        return kwargs
+    kwargs.update(
+        poolclass=TimedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+    if "+asyncpg" in url:
+        kwargs["connect_args"] = {"statement_cache_size": DB_STATEMENT_CACHE_SIZE}
+    return kwargs
+
+
+engine = create_async_engine(DATABASE_URL, **_engine_kwargs("primary", DATABASE_URL))
 # SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 SessionLocal = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
 
+read_engine = create_async_engine(READ_REPLICA_URL, **_engine_kwargs("replica", READ_REPLICA_URL)) if READ_REPLICA_URL else None
+ReadSessionLocal = async_sessionmaker(bind=read_engine, class_=AsyncSession, expire_on_commit=False) if read_engine else None
+
+
+class ReplicaHealth:
+    """Cached replication-lag check; at most one probe per REPLICA_LAG_CHECK_INTERVAL."""
+
+    def __init__(self):
+        self.healthy = True
+        self.lag_seconds = 0.0
+        self.fallbacks = 0
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def use_replica(self) -> bool:
+        if read_engine is None:
+            return False
+        if time.monotonic() - self._checked_at >= REPLICA_LAG_CHECK_INTERVAL and not self._lock.locked():
+            async with self._lock:
+                await self._probe()
+        if not self.healthy:
+            self.fallbacks += 1
+        return self.healthy
+
+    async def _measure_lag(self) -> float:
+        async with read_engine.connect() as conn:
+            return float((await conn.execute(text(REPLICA_LAG_QUERY))).scalar() or 0)
+
+    async def _probe(self) -> None:
+        self._checked_at = time.monotonic()
+        if not REPLICA_LAG_QUERY:
+            self.healthy = True
+            return
+        try:
+            self.lag_seconds = await asyncio.wait_for(self._measure_lag(), REPLICA_PROBE_TIMEOUT_SECONDS)
+            self.healthy = self.lag_seconds <= REPLICA_MAX_LAG_SECONDS
+        except Exception:
+            logger.warning("Read replica probe failed; routing reads to the primary", exc_info=True)
+            self.healthy = False
+        if not self.healthy:
+            logger.warning("Read replica lag %.1fs exceeds %.1fs", self.lag_seconds, REPLICA_MAX_LAG_SECONDS)
+
+
+replica_health = ReplicaHealth()
+
+
 # Dependency for FastAPI
 async def get_db():
     async with SessionLocal() as session:
         yield session
+
+
+async def read_session_factory():
+    """The replica's sessionmaker when it is healthy, otherwise the primary's."""
+    return ReadSessionLocal if await replica_health.use_replica() else SessionLocal
+
+
+# Dependency for read-only routes: the replica when it is healthy, otherwise the primary
+async def get_read_db():
+    async with (await read_session_factory())() as session:
+        yield session
+
+
+# Dependency for routes that also write through get_db: without a healthy replica, reads
+# share the request's primary session instead of checking out a second primary connection
+async def get_shared_read_db(db: AsyncSession = Depends(get_db)):
+    if not await replica_health.use_replica():
+        yield db
+        return
+    async with ReadSessionLocal() as session:
+        yield session
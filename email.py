@@ -1,9 +1,9 @@
 # app/models/email_models.py
 
 import uuid
-from typing import Optional
-from sqlalchemy import String, Integer, Enum, ForeignKey
-from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from typing import Any, Dict, Optional
+from sqlalchemy import String, Integer, Enum, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import JSONB, UUID as PG_UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from models.base import Base
 import enum
@@ -40,6 +40,15 @@ class EmailLog(Base):
     sent_at: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     failed_at: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     retries: Mapped[Optional[int]] = mapped_column(Integer, default=0)
+    # outbox fields: template variables, and when the row may next be picked up
+    context: Mapped[Optional[Dict[str, Any]]] = mapped_column(JSONB, nullable=True)
+    created_at: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    next_attempt_at: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
 
     # relationship
     template: Mapped[EmailTemplate] = relationship("EmailTemplate", back_populates="email_logs")
+
+    __table_args__ = (
+        # the outbox worker polls queued rows in next_attempt_at order
+        Index("ix_email_logs_status_next_attempt_at", "status", "next_attempt_at"),
+    )
@@ -0,0 +1,286 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import deque
+from email.message import EmailMessage
+from typing import Any, Dict, List, Optional
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from models.email import EmailLog, EmailStatus, EmailTemplate
+from utils.email_templates import template_cache
+from utils.metrics import smtp_send_duration
+
+logger = logging.getLogger(__name__)
+
+SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USERNAME = os.getenv("SMTP_USERNAME")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+SMTP_FROM = os.getenv("SMTP_FROM", SMTP_USERNAME or "no-reply@localhost")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() == "true"
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "2"))
+SMTP_TIMEOUT_SECONDS = float(os.getenv("SMTP_TIMEOUT_SECONDS", "10"))
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_POLL_INTERVAL_SECONDS = float(os.getenv("OUTBOX_POLL_INTERVAL_SECONDS", "2"))
+OUTBOX_MAX_RETRIES = int(os.getenv("OUTBOX_MAX_RETRIES", "5"))
+OUTBOX_BACKOFF_BASE_SECONDS = int(os.getenv("OUTBOX_BACKOFF_BASE_SECONDS", "5"))
+OUTBOX_BACKOFF_MAX_SECONDS = int(os.getenv("OUTBOX_BACKOFF_MAX_SECONDS", "900"))
+# A claimed row is skipped by other workers for this long; keep it above the time to send a whole batch
+OUTBOX_CLAIM_SECONDS = int(os.getenv("OUTBOX_CLAIM_SECONDS", "600"))
+
+WELCOME_TEMPLATE_NAME = os.getenv("WELCOME_TEMPLATE_NAME", "welcome_email")
+OTP_TEMPLATE_NAME = os.getenv("OTP_TEMPLATE_NAME", "otp_verification")
+
+
+def backoff_seconds(retries: int) -> int:
+    delay = min(OUTBOX_BACKOFF_BASE_SECONDS * (2 ** retries), OUTBOX_BACKOFF_MAX_SECONDS)
+    return int(delay + random.uniform(0, delay / 4))
+
+
+async def enqueue_email(db: AsyncSession, template_name: str, recipient: str, context: Dict[str, Any]) -> EmailLog:
+    """Queue an email in the caller's transaction; it is sent once the caller commits.
+
+    `context` is stored until the row is SENT or FAILED and then cleared.
+    """
+    now = int(time.time())
+    log = EmailLog(
+        email_template_id=(await template_cache.get(db, template_name)).id,
+        recipient_email=recipient,
+        status=EmailStatus.QUEUED,
+        retries=0,
+        context=context,
+        created_at=now,
+        next_attempt_at=now,
+    )
+    db.add(log)
+    db.sync_session.info["outbox_wake"] = True
+    return log
+
+
+async def enqueue_welcome_email(db: AsyncSession, email: str, token: str) -> EmailLog:
+    return await enqueue_email(db, WELCOME_TEMPLATE_NAME, email, {"email": email, "token": token})
+
+
+async def enqueue_otp_email(db: AsyncSession, email: str, code: str) -> EmailLog:
+    return await enqueue_email(db, OTP_TEMPLATE_NAME, email, {"email": email, "otp": code})
+
+
+def render_email(template: EmailTemplate, context: Dict[str, Any]):
+    return template_cache.compile(template).render(context)
+
+
+class SMTPPool:
+    """A few persistent SMTP connections shared by the outbox worker.
+
+    At most `size` connections are checked out at once. Connections are opened
+    lazily and reused across batches; a connection that errors is dropped, and
+    its slot goes back to the semaphore so a waiting send opens a new one.
+    """
+
+    def __init__(self, size: int = SMTP_POOL_SIZE):
+        self.size = size
+        self._idle: List[Any] = []
+        self._slots = asyncio.Semaphore(size)
+
+    async def _connect(self):
+        import aiosmtplib
+        smtp = aiosmtplib.SMTP(hostname=SMTP_HOST, port=SMTP_PORT, timeout=SMTP_TIMEOUT_SECONDS,
+                               start_tls=SMTP_STARTTLS)
+        await smtp.connect()
+        if SMTP_USERNAME and SMTP_PASSWORD:
+            await smtp.login(SMTP_USERNAME, SMTP_PASSWORD)
+        return smtp
+
+    async def acquire(self):
+        await self._slots.acquire()
+        try:
+            while self._idle:
+                smtp = self._idle.pop()
+                if smtp.is_connected:
+                    return smtp
+                smtp.close()
+            return await self._connect()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, smtp, broken: bool = False) -> None:
+        try:
+            if broken or not smtp.is_connected:
+                smtp.close()
+            else:
+                self._idle.append(smtp)
+        finally:
+            self._slots.release()
+
+    async def send(self, message: EmailMessage) -> None:
+        started = time.perf_counter()
+        smtp = await self.acquire()
+        try:
+            await smtp.send_message(message)
+        except Exception:
+            self.release(smtp, broken=True)
+            smtp_send_duration.labels("error").observe(time.perf_counter() - started)
+            raise
+        self.release(smtp)
+        smtp_send_duration.labels("ok").observe(time.perf_counter() - started)
+
+    async def close(self) -> None:
+        while self._idle:
+            smtp = self._idle.pop()
+            try:
+                await smtp.quit()
+            except Exception:
+                smtp.close()
+
+
+class OutboxWorker:
+    """Drains queued EmailLog rows in batches over the SMTP pool.
+
+    Rows are claimed with FOR UPDATE SKIP LOCKED and leased by pushing
+    next_attempt_at OUTBOX_CLAIM_SECONDS ahead; the claim is committed before
+    any SMTP I/O, so no row lock or transaction is held while sending. Any
+    number of workers can run against the same table, and rows of a worker
+    that dies mid-batch are picked up again once the lease runs out. Failed
+    sends are retried with exponential backoff until OUTBOX_MAX_RETRIES, after
+    which the row is marked FAILED.
+    """
+
+    def __init__(self, batch_size: int = OUTBOX_BATCH_SIZE, poll_interval: float = OUTBOX_POLL_INTERVAL_SECONDS):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.pool: Optional[SMTPPool] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.queue_depth = 0
+        self.send_latencies = deque(maxlen=1000)
+
+    def wake(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self) -> None:
+        if self._task is None:
+            self.pool = SMTPPool()
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run(), name="email-outbox")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.pool is not None:
+            await self.pool.close()
+
+    async def _run(self) -> None:
+        from database import SessionLocal
+        while True:
+            try:
+                async with SessionLocal() as db:
+                    drained = await self.drain_batch(db)
+                    self.queue_depth = await self.count_queued(db)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Email outbox batch failed")
+                drained = 0
+            if drained < self.batch_size:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def count_queued(self, db: AsyncSession) -> int:
+        result = await db.execute(select(func.count()).select_from(EmailLog).where(EmailLog.status == EmailStatus.QUEUED))
+        return result.scalar_one()
+
+    async def drain_batch(self, db: AsyncSession) -> int:
+        now = int(time.time())
+        result = await db.execute(
+            select(EmailLog)
+            .options(selectinload(EmailLog.template))
+            .where(EmailLog.status == EmailStatus.QUEUED, EmailLog.next_attempt_at <= now)
+            .order_by(EmailLog.next_attempt_at)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True, of=EmailLog)
+        )
+        logs: List[EmailLog] = list(result.scalars())
+        if not logs:
+            await db.rollback()
+            return 0
+        for log in logs:
+            log.next_attempt_at = now + OUTBOX_CLAIM_SECONDS
+        await db.commit()
+        await asyncio.gather(*(self._deliver(log) for log in logs))
+        # Outcomes are written in a new, short transaction
+        await db.commit()
+        return len(logs)
+
+    async def _deliver(self, log: EmailLog) -> None:
+        started = time.perf_counter()
+        try:
+            subject, body = render_email(log.template, log.context or {})
+            message = EmailMessage()
+            message["From"] = SMTP_FROM
+            message["To"] = log.recipient_email
+            message["Subject"] = subject
+            message.set_content(body, subtype="html")
+            await self.pool.send(message)
+        except Exception as e:
+            retries = (log.retries or 0) + 1
+            log.retries = retries
+            log.error_message = str(e)[:500]
+            if retries > OUTBOX_MAX_RETRIES:
+                log.status = EmailStatus.FAILED
+                log.failed_at = int(time.time())
+                log.context = None
+                self.failed += 1
+            else:
+                log.next_attempt_at = int(time.time()) + backoff_seconds(retries - 1)
+                self.retried += 1
+            logger.warning("Email to %s failed (attempt %s): %s", log.recipient_email, retries, e)
+            return
+        self.send_latencies.append(time.perf_counter() - started)
+        log.status = EmailStatus.SENT
+        log.sent_at = int(time.time())
+        log.error_message = None
+        # The context holds live secrets (OTP codes, verification tokens); keep it only while the row can be sent
+        log.context = None
+        self.sent += 1
+
+    def stats(self) -> dict:
+        latencies = sorted(self.send_latencies)
+
+        def pct(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] if latencies else None
+
+        return {
+            "queue_depth": self.queue_depth,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "send_latency_p50_seconds": pct(0.50),
+            "send_latency_p95_seconds": pct(0.95),
+        }
+
+
+outbox_worker = OutboxWorker()
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_outbox_after_commit(session):
+    # Queued rows only become visible to the worker once the request transaction commits
+    if session.info.pop("outbox_wake", False):
+        outbox_worker.wake()
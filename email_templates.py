@@ -0,0 +1,127 @@
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.email import EmailTemplate
+
+# Within this window a cached template is used without touching the database
+TEMPLATE_REVALIDATE_SECONDS = float(os.getenv("TEMPLATE_REVALIDATE_SECONDS", "30"))
+
+
+@dataclass
+class CompiledTemplate:
+    id: uuid.UUID
+    name: str
+    updated_at: Optional[int]
+    subject: Any  # jinja2.Template
+    body: Any  # jinja2.Template
+    checked_at: float
+
+    def render(self, context: Dict[str, Any]):
+        return self.subject.render(**context), self.body.render(**context)
+
+
+def _compile(template: EmailTemplate) -> CompiledTemplate:
+    env = _environment()
+    return CompiledTemplate(
+        id=template.id,
+        name=template.template_name,
+        updated_at=template.updated_at,
+        subject=env.from_string(template.subject),
+        body=env.from_string(template.body),
+        checked_at=time.monotonic(),
+    )
+
+
+_env = None
+
+
+def _environment():
+    global _env
+    if _env is None:
+        from jinja2 import Environment
+        _env = Environment(autoescape=False, cache_size=0)
+    return _env
+
+
+class TemplateCache:
+    """Compiled email templates keyed by template_name.
+
+    A cached entry is trusted for TEMPLATE_REVALIDATE_SECONDS; after that a
+    single-column `updated_at` lookup decides whether the template is
+    recompiled or just re-stamped.
+    """
+
+    def __init__(self, revalidate_seconds: float = TEMPLATE_REVALIDATE_SECONDS):
+        self.revalidate_seconds = revalidate_seconds
+        self._templates: Dict[str, CompiledTemplate] = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        with self._lock:
+            if name is None:
+                self._templates.clear()
+            else:
+                self._templates.pop(name, None)
+
+    async def get(self, db: AsyncSession, name: str) -> CompiledTemplate:
+        cached = self._templates.get(name)
+        now = time.monotonic()
+        if cached is not None and now - cached.checked_at < self.revalidate_seconds:
+            return cached
+
+        if cached is not None:
+            result = await db.execute(select(EmailTemplate.updated_at).where(EmailTemplate.id == cached.id))
+            row = result.one_or_none()
+            if row is not None and row.updated_at == cached.updated_at:
+                cached.checked_at = now
+                return cached
+
+        result = await db.execute(select(EmailTemplate).where(EmailTemplate.template_name == name))
+        template = result.scalar_one_or_none()
+        if template is None:
+            self.invalidate(name)
+            raise LookupError(f"Email template '{name}' not found")
+        compiled = _compile(template)
+        with self._lock:
+            self._templates[name] = compiled
+        return compiled
+
+    def compile(self, template: EmailTemplate) -> CompiledTemplate:
+        """Compile a template row that is already loaded, caching the result."""
+        cached = self._templates.get(template.template_name)
+        if cached is not None and cached.id == template.id and cached.updated_at == template.updated_at:
+            return cached
+        compiled = _compile(template)
+        with self._lock:
+            self._templates[template.template_name] = compiled
+        return compiled
+
+    async def warm(self, db: AsyncSession) -> int:
+        result = await db.execute(select(EmailTemplate))
+        templates = list(result.scalars())
+        compiled = {template.template_name: _compile(template) for template in templates}
+        with self._lock:
+            self._templates = compiled
+        return len(compiled)
+
+
+template_cache = TemplateCache()
+
+
+async def warm_template_cache() -> int:
+    from database import SessionLocal
+    async with SessionLocal() as db:
+        return await template_cache.warm(db)
+
+
+@event.listens_for(EmailTemplate, "after_update")
+@event.listens_for(EmailTemplate, "after_delete")
+def _invalidate_on_edit(mapper, connection, target):
+    # Edits made through the ORM in this process drop the entry straight away;
+    # edits from elsewhere are caught by the updated_at revalidation.
+    template_cache.invalidate(target.template_name)
@@ -0,0 +1,61 @@
+import datetime
+import os
+from typing import Any, AsyncIterator, Dict, List, Mapping
+import orjson
+from fastapi.responses import StreamingResponse
+from schemas.asset import AssetModel
+
+JSON_STREAM_CHUNK_BYTES = int(os.getenv("JSON_STREAM_CHUNK_BYTES", str(64 * 1024)))
+# Rows fetched per round trip from the server-side cursor
+JSON_STREAM_FETCH_ROWS = int(os.getenv("JSON_STREAM_FETCH_ROWS", "1000"))
+
+# AssetModel field name -> JSON key, read once instead of building a model per row
+ASSET_ALIASES = {name: field.alias or name for name, field in AssetModel.model_fields.items()}
+# Stored as timestamptz, returned as epoch milliseconds (the format AssetModel accepts)
+_ASSET_TIMESTAMP_KEYS = (("created_ts", ASSET_ALIASES["created_ts"]), ("insert_ts", ASSET_ALIASES["insert_ts"]))
+
+
+def epoch_millis(value: datetime.datetime) -> int:
+    return int(value.timestamp() * 1000)
+
+
+def encode_asset(row: Mapping[str, Any], alert_counts: List[dict]) -> bytes:
+    """One asset as JSON bytes from (created_ts, insert_ts, payload) columns.
+
+    The stored payload is already keyed by alias, so only the timestamps and
+    the alert counts are rewritten.
+    """
+    asset = dict(row["payload"])
+    for column, key in _ASSET_TIMESTAMP_KEYS:
+        asset[key] = epoch_millis(row[column])
+    asset[ASSET_ALIASES["alerts_count"]] = asset[ASSET_ALIASES["alert_count_by_severity"]] = alert_counts
+    return orjson.dumps(asset)
+
+
+async def stream_json_object(batches: AsyncIterator[List[bytes]], tail: Dict[str, Any]) -> AsyncIterator[bytes]:
+    """Stream {"items": [...], **tail} from batches of pre-encoded items.
+
+    Output is flushed in JSON_STREAM_CHUNK_BYTES pieces, so memory stays at
+    one batch plus one chunk however long the list is. `tail` is read only
+    after the last batch, so the producer can fill in a cursor as it goes.
+    """
+    buffer = [b'{"items":[']
+    size = 0
+    first = True
+    async for batch in batches:
+        for item in batch:
+            if not first:
+                buffer.append(b",")
+            buffer.append(item)
+            size += len(item) + 1
+            first = False
+        if size >= JSON_STREAM_CHUNK_BYTES:
+            yield b"".join(buffer)
+            buffer.clear()
+            size = 0
+    buffer.append(b"]," + orjson.dumps(tail)[1:] if tail else b"]}")
+    yield b"".join(buffer)
+
+
+def json_stream_response(batches: AsyncIterator[List[bytes]], tail: Dict[str, Any]) -> StreamingResponse:
+    return StreamingResponse(stream_json_object(batches, tail), media_type="application/json")
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import os
+import re
+import time
+from typing import Any, Dict, Optional
+import jwt
+from jwt.algorithms import RSAAlgorithm
+from config import CLIENT_ID, JWKS_URL, TENANT_ID
+
+logger = logging.getLogger(__name__)
+
+ID_TOKEN_ISSUER = os.getenv("AZURE_ID_TOKEN_ISSUER", f"https://login.microsoftonline.com/{TENANT_ID}/v2.0")
+JWKS_DEFAULT_TTL_SECONDS = int(os.getenv("JWKS_DEFAULT_TTL_SECONDS", "3600"))
+# Refresh this long before the cached set expires
+JWKS_REFRESH_AHEAD_SECONDS = int(os.getenv("JWKS_REFRESH_AHEAD_SECONDS", "300"))
+# An unknown kid triggers at most one fetch per interval, so junk tokens cannot hammer the IdP
+JWKS_MIN_REFRESH_INTERVAL_SECONDS = int(os.getenv("JWKS_MIN_REFRESH_INTERVAL_SECONDS", "30"))
+JWKS_FETCH_TIMEOUT_SECONDS = float(os.getenv("JWKS_FETCH_TIMEOUT_SECONDS", "5"))
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class JWKSUnavailable(Exception):
+    """No signing keys are cached and the IdP's key set could not be fetched."""
+
+
+class JWKSCache:
+    """Signing keys from the IdP's JWKS endpoint.
+
+    Concurrent refreshes share a single in-flight fetch. If the IdP is
+    unreachable the last good key set keeps being served.
+    """
+
+    def __init__(self, url: str = JWKS_URL, default_ttl: int = JWKS_DEFAULT_TTL_SECONDS,
+                 refresh_ahead: int = JWKS_REFRESH_AHEAD_SECONDS,
+                 min_refresh_interval: int = JWKS_MIN_REFRESH_INTERVAL_SECONDS):
+        self.url = url
+        self.default_ttl = default_ttl
+        self.refresh_ahead = refresh_ahead
+        self.min_refresh_interval = min_refresh_interval
+        self._keys: Dict[str, Any] = {}
+        self._expires_at = 0.0
+        self._last_fetch_attempt = float("-inf")
+        self._inflight: Optional[asyncio.Task] = None
+        self._background: Optional[asyncio.Task] = None
+        self._client = None
+        self.fetches = 0
+        self.fetch_failures = 0
+
+    def _http(self):
+        if self._client is None:
+            import httpx
+            self._client = httpx.AsyncClient(timeout=JWKS_FETCH_TIMEOUT_SECONDS)
+        return self._client
+
+    async def _fetch(self) -> None:
+        import httpx
+        self._last_fetch_attempt = time.monotonic()
+        self.fetches += 1
+        try:
+            response = await self._http().get(self.url)
+            response.raise_for_status()
+            keys = {}
+            for jwk in response.json().get("keys", []):
+                kid = jwk.get("kid")
+                if kid and jwk.get("kty") == "RSA":
+                    keys[kid] = RSAAlgorithm.from_jwk(jwk)
+            if not keys:
+                raise ValueError("JWKS response contained no RSA keys")
+        except (httpx.HTTPError, ValueError, jwt.InvalidKeyError) as exc:
+            self.fetch_failures += 1
+            if self._keys:
+                logger.warning("JWKS refresh failed, serving %d cached keys", len(self._keys), exc_info=True)
+                return
+            raise JWKSUnavailable(f"Could not fetch signing keys from {self.url}") from exc
+        match = _MAX_AGE.search(response.headers.get("cache-control", ""))
+        ttl = int(match.group(1)) if match else self.default_ttl
+        self._keys = keys
+        self._expires_at = time.monotonic() + ttl
+
+    async def refresh(self) -> None:
+        """Fetch the key set; callers arriving during a fetch await the same one."""
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.create_task(self._fetch())
+        await asyncio.shield(self._inflight)
+
+    async def get_key(self, kid: str):
+        key = self._keys.get(kid)
+        if key is not None:
+            return key
+        # The refresh interval also applies with an empty cache, so an IdP outage is
+        # not turned into one fetch per request; a fetch already in flight is joined
+        fetching = self._inflight is not None and not self._inflight.done()
+        if fetching or time.monotonic() - self._last_fetch_attempt >= self.min_refresh_interval:
+            await self.refresh()
+            key = self._keys.get(kid)
+        elif not self._keys:
+            raise JWKSUnavailable("No signing keys cached and the last fetch failed")
+        if key is None:
+            raise jwt.InvalidTokenError(f"Unknown signing key '{kid}'")
+        return key
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            delay = max(self._expires_at - time.monotonic() - self.refresh_ahead, self.min_refresh_interval)
+            await asyncio.sleep(delay)
+            try:
+                await self.refresh()
+            except Exception:
+                logger.warning("Background JWKS refresh failed", exc_info=True)
+
+    def start(self) -> None:
+        if self._background is None:
+            self._background = asyncio.create_task(self._refresh_loop(), name="jwks-refresh")
+
+    async def stop(self) -> None:
+        if self._background is not None:
+            self._background.cancel()
+            self._background = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+jwks_cache = JWKSCache()
+
+
+async def validate_id_token(id_token: str, audience: Optional[str] = CLIENT_ID,
+                            issuer: Optional[str] = ID_TOKEN_ISSUER) -> Dict[str, Any]:
+    header = jwt.get_unverified_header(id_token)
+    key = await jwks_cache.get_key(header.get("kid", ""))
+    return jwt.decode(id_token, key, algorithms=["RS256"], audience=audience, issuer=issuer)
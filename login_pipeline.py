@@ -0,0 +1,74 @@
+import hmac
+import os
+import time
+from dataclasses import replace
+from typing import Optional, Tuple
+from sqlalchemy import or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.customer import Customer
+from utils.customer_cache import CustomerAuth, customer_cache, get_customer_auth
+
+# Number of 30s steps accepted either side of the current one (clock drift)
+TOTP_VALID_WINDOW = int(os.getenv("TOTP_VALID_WINDOW", "1"))
+
+
+def match_totp_step(secret: str, code: str, last_step: Optional[int] = None,
+                    valid_window: int = TOTP_VALID_WINDOW, for_time: Optional[float] = None) -> Optional[int]:
+    """Return the TOTP time step `code` belongs to, or None.
+
+    Steps at or before `last_step` are skipped, so a code that was already
+    used cannot be replayed within its validity window.
+    """
+    import pyotp
+    totp = pyotp.TOTP(secret)
+    current = int((for_time if for_time is not None else time.time()) // totp.interval)
+    for step in range(current - valid_window, current + valid_window + 1):
+        if last_step is not None and step <= last_step:
+            continue
+        if hmac.compare_digest(totp.generate_otp(step), code):
+            return step
+    return None
+
+
+async def load_totp_match(db: AsyncSession, email: str, code: str) -> Tuple[Optional[CustomerAuth], Optional[int]]:
+    """Load the customer's auth state once and verify `code` in memory.
+
+    Served from the customer cache when possible. On a mismatch the state is
+    reloaded once, in case the cached secret predates an enrolment made on
+    another worker.
+    """
+    customer = await get_customer_auth(email, db)
+    if customer is None:
+        return None, None
+    step = match_totp_step(customer.mfa_secret, code, customer.mfa_last_totp_step) if customer.mfa_secret else None
+    if step is None:
+        customer = await get_customer_auth(email, db, refresh=True)
+        if customer is not None and customer.mfa_secret:
+            step = match_totp_step(customer.mfa_secret, code, customer.mfa_last_totp_step)
+    return customer, step
+
+
+async def commit_totp_step(db: AsyncSession, customer: CustomerAuth, step: int, **values) -> bool:
+    """Record `step` as the last used TOTP step (plus any extra column values)
+    in a single conditional UPDATE.
+
+    Returns False when another request already used this or a later step,
+    which makes the replay check atomic across workers.
+    """
+    result = await db.execute(
+        update(Customer)
+        .where(
+            Customer.id == customer.id,
+            or_(Customer.mfa_last_totp_step.is_(None), Customer.mfa_last_totp_step < step),
+        )
+        .values(mfa_last_totp_step=step, **values)
+    )
+    await db.commit()
+    if result.rowcount != 1:
+        customer_cache.invalidate(customer.email)
+        return False
+    if values:
+        customer_cache.invalidate(customer.email)
+    else:
+        customer_cache.put(replace(customer, mfa_last_totp_step=step))
+    return True
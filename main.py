@@ -1,8 +1,28 @@
 import os
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from routers.auth_service import router as customer_auth_router
+from routers.asset_service import router as asset_router
+from routers.alert_service import router as alert_router
+from routers.consultant_service import router as consultant_router
+from utils.saml_executor import acs_stats, shutdown_acs_executor
+from utils.email_outbox import outbox_worker
+from utils.email_templates import warm_template_cache
+from utils.qr_codes import shutdown_qr_executor
+from auth.jwks import jwks_cache
+from auth.otp_store import get_otp_store
+from utils.session_store import get_session_store
+from utils.alert_rollup import rollup_reconciler
+from utils.asset_search import asset_index
+from database import engine, pool_stats, read_engine, replica_health
+from prometheus_client import CONTENT_TYPE_LATEST
+from utils.metrics import METRICS_ENABLED, MetricsMiddleware, add_collector, gauge, instrument_engine, render_latest
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
+from starlette.responses import Response
+
+# Lets a worker bring the schema up to date itself; a couple of queries and no DDL when it already is
+SCHEMA_BOOTSTRAP_ON_STARTUP = os.getenv("SCHEMA_BOOTSTRAP_ON_STARTUP", "false").lower() == "true"
+
 app = FastAPI()
 origins = [
     "http://localhost:5000",
@@ -23,8 +43,82 @@ app.add_middleware(
     same_site="lax",
     https_only=False  # Set to True in production
 )
+# Request/query instrumentation is only installed when metrics are enabled
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    instrument_engine(engine)
+    if read_engine is not None:
+        instrument_engine(read_engine)
 # Register Routers
 app.include_router(customer_auth_router, prefix="", tags=["Customers"])
+app.include_router(asset_router, prefix="", tags=["Assets"])
+app.include_router(alert_router, prefix="", tags=["Alerts"])
+app.include_router(consultant_router, prefix="", tags=["Consultants"])
+
+@app.on_event("startup")
+async def startup():
+    if SCHEMA_BOOTSTRAP_ON_STARTUP:
+        from utils.schema_bootstrap import ensure_schema
+        await ensure_schema(engine)
+    # Fail fast on OTP/SSO session backends that cannot work with this deployment (e.g. memory with several workers)
+    get_otp_store()
+    get_session_store()
+    # Pre-compile every email template so the first OTP after a deploy is not slow
+    await warm_template_cache()
+    outbox_worker.start()
+    jwks_cache.start()
+    rollup_reconciler.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await outbox_worker.stop()
+    await jwks_cache.stop()
+    await rollup_reconciler.stop()
+    await asset_index.stop()
+    shutdown_acs_executor()
+    shutdown_qr_executor()
+
+@app.get("/db/pool-stats")
+async def db_pool_stats():
+    return {
+        "pools": pool_stats.snapshot(),
+        "replica": {
+            "configured": read_engine is not None,
+            "healthy": replica_health.healthy,
+            "lag_seconds": replica_health.lag_seconds,
+            "fallbacks": replica_health.fallbacks,
+        },
+    }
+
+@app.get("/email-outbox/stats")
+async def email_outbox_stats():
+    return outbox_worker.stats()
+
+_pool_checkouts = gauge("db_pool_checkouts", "Connections checked out of the pool", ("pool",))
+_pool_wait = gauge("db_pool_wait_seconds_total", "Time spent waiting for a pooled connection", ("pool",))
+_replica_lag = gauge("db_replica_lag_seconds", "Last measured read replica lag")
+_outbox = gauge("email_outbox", "Email outbox counters", ("stat",))
+_acs_in_flight = gauge("saml_acs_in_flight", "SAML responses currently being validated")
+
+
+def _collect_stats() -> None:
+    for name, stats in pool_stats.snapshot().items():
+        _pool_checkouts.labels(name).set(stats["checkouts"])
+        _pool_wait.labels(name).set(stats["wait_seconds_total"])
+    _replica_lag.set(replica_health.lag_seconds)
+    outbox = outbox_worker.stats()
+    for stat in ("queue_depth", "sent", "failed", "retried"):
+        _outbox.labels(stat).set(outbox[stat])
+    _acs_in_flight.set(acs_stats.in_flight)
+
+
+add_collector(_collect_stats)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(render_latest(), media_type=CONTENT_TYPE_LATEST)
 
 @app.get("/")
 async def root():
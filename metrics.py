@@ -0,0 +1,128 @@
+import contextvars
+import os
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+
+# Off by default: with scraping disabled no middleware or SQL hooks are installed
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+# The app's own registry, so /metrics exports what is defined here and not the default process collectors
+registry = CollectorRegistry()
+# Called before rendering so gauges backed by other modules' stats are fresh
+_collectors: List[Callable[[], None]] = []
+
+
+def counter(name, documentation, labelnames=()) -> Counter:
+    return Counter(name, documentation, labelnames, registry=registry)
+
+
+def gauge(name, documentation, labelnames=()) -> Gauge:
+    return Gauge(name, documentation, labelnames, registry=registry)
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+    return Histogram(name, documentation, labelnames, registry=registry, buckets=buckets)
+
+
+def add_collector(collector: Callable[[], None]) -> None:
+    _collectors.append(collector)
+
+
+def histogram_totals(metric: Histogram) -> Dict[Tuple[str, ...], Tuple[int, float]]:
+    """Label values -> (observation count, sum of observed values)."""
+    totals: Dict[Tuple[str, ...], Tuple[int, float]] = {}
+    for family in metric.collect():
+        for sample in family.samples:
+            if sample.name.endswith("_count"):
+                key = tuple(sample.labels.values())
+                totals[key] = (int(sample.value), totals.get(key, (0, 0.0))[1])
+            elif sample.name.endswith("_sum"):
+                key = tuple(sample.labels.values())
+                totals[key] = (totals.get(key, (0, 0.0))[0], sample.value)
+    return totals
+
+
+http_request_duration = histogram("http_request_duration_seconds", "HTTP request latency", ("method", "route", "status"))
+http_requests_in_flight = gauge("http_requests_in_flight", "HTTP requests currently being served")
+http_request_queries = histogram("http_request_queries", "SQL statements executed per HTTP request",
+                                 ("method", "route"), buckets=QUERY_COUNT_BUCKETS)
+db_query_duration = histogram("db_query_duration_seconds", "SQL statement latency", ("operation",))
+smtp_send_duration = histogram("smtp_send_duration_seconds", "SMTP send latency", ("outcome",))
+saml_duration = histogram("saml_duration_seconds", "SAML processing time", ("operation",))
+saml_acs_queue_duration = histogram("saml_acs_queue_seconds", "Time a SAML response waited for a worker")
+
+# Per-request SQL statement counter; None outside an instrumented request
+_request_queries: contextvars.ContextVar[Optional[List[int]]] = contextvars.ContextVar("request_queries", default=None)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware (no BaseHTTPMiddleware task overhead)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def _route(self, scope) -> str:
+        route = scope.get("route")
+        if route is not None:
+            return route.path
+        from starlette.routing import Match
+        for candidate in scope["app"].router.routes:
+            match, _ = candidate.matches(scope)
+            if match == Match.FULL:
+                return getattr(candidate, "path", "unmatched")
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = ["500"]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = str(message["status"])
+            await send(message)
+
+        queries = [0]
+        token = _request_queries.set(queries)
+        http_requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_flight.dec()
+            _request_queries.reset(token)
+            route = self._route(scope)
+            http_request_duration.labels(scope["method"], route, status[0]).observe(elapsed)
+            http_request_queries.labels(scope["method"], route).observe(queries[0])
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement else "UNKNOWN"
+    db_query_duration.labels(operation).observe(time.perf_counter() - started)
+    queries = _request_queries.get()
+    if queries is not None:
+        queries[0] += 1
+
+
+def instrument_engine(engine) -> None:
+    from sqlalchemy import event
+    sync_engine = getattr(engine, "sync_engine", engine)
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def render_latest() -> bytes:
+    for collector in _collectors:
+        collector()
+    return generate_latest(registry)
@@ -0,0 +1,266 @@
+import hashlib
+import hmac
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+from sqlalchemy import delete, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import WEB_CONCURRENCY
+from models.pending_otp import PendingOTP
+
+OTP_TTL_SECONDS = int(os.getenv("OTP_TTL_SECONDS", "300"))
+OTP_MAX_ATTEMPTS = int(os.getenv("OTP_MAX_ATTEMPTS", "5"))
+# database and redis are shared by all workers; memory is per process and single-worker only
+OTP_STORE_BACKEND = os.getenv("OTP_STORE_BACKEND", "database")  # database | redis | memory
+OTP_SWEEP_INTERVAL_SECONDS = int(os.getenv("OTP_SWEEP_INTERVAL_SECONDS", "30"))
+
+
+def normalize_email(email: str) -> str:
+    """The key every store and rate limiter uses for an email address."""
+    return email.strip().lower()
+
+
+class OTPStore:
+    """Keeps one pending OTP per email, outside of the customers table.
+
+    Emails are keyed through normalize_email(), like the per-email rate limit.
+    consume() is an atomic validate-and-consume: a matching code is deleted in
+    the same step it is checked, and a code is burned after max_attempts misses.
+
+    `db` is the caller's database session. The database backend runs in it
+    instead of checking out another pool connection; put() leaves the commit
+    to the caller, consume() commits so a miss is counted even if the request
+    fails afterwards. The other backends ignore it.
+    """
+
+    def __init__(self, ttl: int = OTP_TTL_SECONDS, max_attempts: int = OTP_MAX_ATTEMPTS):
+        self.ttl = ttl
+        self.max_attempts = max_attempts
+
+    async def put(self, email: str, code: str, db: Optional[AsyncSession] = None) -> None:
+        raise NotImplementedError
+
+    async def consume(self, email: str, code: str, db: Optional[AsyncSession] = None) -> bool:
+        raise NotImplementedError
+
+    async def discard(self, email: str) -> None:
+        raise NotImplementedError
+
+
+class _Entry:
+    __slots__ = ("code", "expires_at", "attempts")
+
+    def __init__(self, code: str, expires_at: float):
+        self.code = code
+        self.expires_at = expires_at
+        self.attempts = 0
+
+
+class MemoryOTPStore(OTPStore):
+    """Per-process dict; /request-otp and /verify-otp must hit the same worker."""
+
+    def __init__(self, ttl: int = OTP_TTL_SECONDS, max_attempts: int = OTP_MAX_ATTEMPTS,
+                 sweep_interval: int = OTP_SWEEP_INTERVAL_SECONDS):
+        super().__init__(ttl, max_attempts)
+        self.sweep_interval = sweep_interval
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + sweep_interval
+
+    def _sweep(self, now: float) -> None:
+        # Called with the lock held; amortised so the scan runs at most once per interval
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self.sweep_interval
+        expired = [email for email, entry in self._entries.items() if entry.expires_at <= now]
+        for email in expired:
+            del self._entries[email]
+
+    async def put(self, email: str, code: str, db: Optional[AsyncSession] = None) -> None:
+        email = normalize_email(email)
+        now = time.monotonic()
+        with self._lock:
+            self._sweep(now)
+            self._entries[email] = _Entry(code, now + self.ttl)
+
+    async def consume(self, email: str, code: str, db: Optional[AsyncSession] = None) -> bool:
+        email = normalize_email(email)
+        now = time.monotonic()
+        with self._lock:
+            self._sweep(now)
+            entry = self._entries.get(email)
+            if entry is None:
+                return False
+            if entry.expires_at <= now:
+                del self._entries[email]
+                return False
+            if hmac.compare_digest(entry.code, code):
+                del self._entries[email]
+                return True
+            entry.attempts += 1
+            if entry.attempts >= self.max_attempts:
+                del self._entries[email]
+            return False
+
+    async def discard(self, email: str) -> None:
+        email = normalize_email(email)
+        with self._lock:
+            self._entries.pop(email, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# KEYS[1] = otp hash key; ARGV[1] = submitted code, ARGV[2] = max attempts
+_CONSUME_SCRIPT = """
+local code = redis.call('HGET', KEYS[1], 'code')
+if not code then
+  return 0
+end
+if code == ARGV[1] then
+  redis.call('DEL', KEYS[1])
+  return 1
+end
+local attempts = redis.call('HINCRBY', KEYS[1], 'attempts', 1)
+if attempts >= tonumber(ARGV[2]) then
+  redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisOTPStore(OTPStore):
+    """Redis-protocol backend; expiry is handled by the server's key TTL."""
+
+    def __init__(self, client=None, ttl: int = OTP_TTL_SECONDS, max_attempts: int = OTP_MAX_ATTEMPTS,
+                 prefix: str = "otp:"):
+        super().__init__(ttl, max_attempts)
+        if client is None:
+            from utils.redis_client import get_redis
+            client = get_redis()
+        self.client = client
+        self.prefix = prefix
+        self._consume = client.register_script(_CONSUME_SCRIPT)
+
+    def _key(self, email: str) -> str:
+        return f"{self.prefix}{email}"
+
+    async def put(self, email: str, code: str, db: Optional[AsyncSession] = None) -> None:
+        email = normalize_email(email)
+        key = self._key(email)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.hset(key, mapping={"code": code, "attempts": 0})
+            pipe.expire(key, self.ttl)
+            await pipe.execute()
+
+    async def consume(self, email: str, code: str, db: Optional[AsyncSession] = None) -> bool:
+        email = normalize_email(email)
+        result = await self._consume(keys=[self._key(email)], args=[code, self.max_attempts])
+        return bool(int(result))
+
+    async def discard(self, email: str) -> None:
+        email = normalize_email(email)
+        await self.client.delete(self._key(email))
+
+
+def _code_hash(email: str, code: str) -> str:
+    return hashlib.sha256(f"{email}:{code}".encode()).hexdigest()
+
+
+class DatabaseOTPStore(OTPStore):
+    """Shared by every worker through the pending_otps table, with no extra infrastructure.
+
+    A matching code is consumed by a single DELETE ... RETURNING, so two
+    workers can never both accept it. Expired rows are swept by put() at most
+    once per sweep interval per worker. Without a caller session each call
+    opens its own, i.e. one more pool connection for the request.
+    """
+
+    def __init__(self, session_factory=None, ttl: int = OTP_TTL_SECONDS, max_attempts: int = OTP_MAX_ATTEMPTS,
+                 sweep_interval: int = OTP_SWEEP_INTERVAL_SECONDS):
+        super().__init__(ttl, max_attempts)
+        self._session_factory = session_factory
+        self.sweep_interval = sweep_interval
+        self._next_sweep = time.monotonic() + sweep_interval
+
+    @asynccontextmanager
+    async def _session(self, db: Optional[AsyncSession]):
+        if db is not None:
+            yield db
+            return
+        if self._session_factory is None:
+            from database import SessionLocal
+            self._session_factory = SessionLocal
+        async with self._session_factory() as own:
+            yield own
+            await own.commit()
+
+    async def put(self, email: str, code: str, db: Optional[AsyncSession] = None) -> None:
+        email = normalize_email(email)
+        now = int(time.time())
+        stmt = insert(PendingOTP).values(email=email, code_hash=_code_hash(email, code), expires_at=now + self.ttl,
+                                         attempts=0)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[PendingOTP.email],
+            set_={"code_hash": stmt.excluded.code_hash, "expires_at": stmt.excluded.expires_at, "attempts": 0},
+        )
+        async with self._session(db) as session:
+            await session.execute(stmt)
+            if time.monotonic() >= self._next_sweep:
+                self._next_sweep = time.monotonic() + self.sweep_interval
+                await session.execute(delete(PendingOTP).where(PendingOTP.expires_at <= now))
+
+    async def consume(self, email: str, code: str, db: Optional[AsyncSession] = None) -> bool:
+        email = normalize_email(email)
+        now = int(time.time())
+        async with self._session(db) as session:
+            matched = (await session.execute(
+                delete(PendingOTP)
+                .where(PendingOTP.email == email, PendingOTP.code_hash == _code_hash(email, code),
+                       PendingOTP.expires_at > now)
+                .returning(PendingOTP.email)
+            )).first()
+            if matched is None:
+                # A miss counts as an attempt; the code is burned once attempts run out or it has expired
+                entry = (await session.execute(
+                    update(PendingOTP)
+                    .where(PendingOTP.email == email)
+                    .values(attempts=PendingOTP.attempts + 1)
+                    .returning(PendingOTP.attempts, PendingOTP.expires_at)
+                )).first()
+                if entry is not None and (entry.attempts >= self.max_attempts or entry.expires_at <= now):
+                    await session.execute(delete(PendingOTP).where(PendingOTP.email == email))
+            await session.commit()
+        return matched is not None
+
+    async def discard(self, email: str) -> None:
+        email = normalize_email(email)
+        async with self._session(None) as session:
+            await session.execute(delete(PendingOTP).where(PendingOTP.email == email))
+
+
+_store: Optional[OTPStore] = None
+
+
+def get_otp_store() -> OTPStore:
+    global _store
+    if _store is None:
+        if OTP_STORE_BACKEND == "redis":
+            _store = RedisOTPStore()
+        elif OTP_STORE_BACKEND == "memory":
+            if WEB_CONCURRENCY > 1:
+                raise RuntimeError("OTP_STORE_BACKEND=memory keeps OTPs per process and cannot be used with "
+                                   "WEB_CONCURRENCY > 1; use database or redis")
+            _store = MemoryOTPStore()
+        else:
+            _store = DatabaseOTPStore()
+    return _store
+
+
+def set_otp_store(store: OTPStore) -> None:
+    global _store
+    _store = store
@@ -0,0 +1,14 @@
+from sqlalchemy import Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+from models.base import Base
+
+
+class PendingOTP(Base):
+    """One outstanding OTP per email for the database OTP store; deleted once used, burned or expired."""
+    __tablename__ = "pending_otps"
+
+    email: Mapped[str] = mapped_column(String, primary_key=True)
+    # SHA-256 of email and code; the plaintext only travels in the OTP email (see utils.email_outbox)
+    code_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    expires_at: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
@@ -0,0 +1,118 @@
+import asyncio
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+MFA_ISSUER_NAME = os.getenv("MFA_ISSUER_NAME", "eSecForte")
+# How long an enrolment QR stays available; also the enrolment token lifetime
+MFA_ENROLMENT_TTL_SECONDS = int(os.getenv("MFA_ENROLMENT_TTL_SECONDS", "600"))
+# Threads, like the ACS pool: a render takes milliseconds, and forking a process pool from a
+# threaded asyncio worker can deadlock
+QR_RENDER_EXECUTOR = os.getenv("QR_RENDER_EXECUTOR", "thread")  # thread | process | inline
+QR_RENDER_WORKERS = int(os.getenv("QR_RENDER_WORKERS", "2"))
+QR_CACHE_MAX_ENTRIES = int(os.getenv("QR_CACHE_MAX_ENTRIES", "1000"))
+
+
+def render_qr_png(email: str, secret: str) -> bytes:
+    """Render the authenticator provisioning URI as a PNG. CPU-bound; runs in the pool."""
+    import pyotp
+    import qrcode
+    uri = pyotp.TOTP(secret).provisioning_uri(name=email, issuer_name=MFA_ISSUER_NAME)
+    buffer = io.BytesIO()
+    qrcode.make(uri).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+_executor: Optional[Executor] = None
+
+
+def _get_executor() -> Optional[Executor]:
+    global _executor
+    if _executor is None and QR_RENDER_EXECUTOR != "inline":
+        if QR_RENDER_EXECUTOR == "process":
+            _executor = ProcessPoolExecutor(max_workers=QR_RENDER_WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=QR_RENDER_WORKERS, thread_name_prefix="qr-render")
+    return _executor
+
+
+class QRCodeCache:
+    """PNG bytes per (email, secret) for the length of the enrolment window.
+
+    Concurrent requests for the same key share one render.
+    """
+
+    def __init__(self, ttl: float = MFA_ENROLMENT_TTL_SECONDS, max_entries: int = QR_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], tuple[float, bytes]]" = OrderedDict()
+        self._pending: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._lock = threading.Lock()
+
+    def peek(self, email: str, secret: str) -> Optional[bytes]:
+        key = (email.lower(), secret)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            return entry[1]
+
+    def put(self, email: str, secret: str, png: bytes) -> None:
+        with self._lock:
+            key = (email.lower(), secret)
+            self._entries[key] = (time.monotonic() + self.ttl, png)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, email: str) -> None:
+        email = email.lower()
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == email]:
+                del self._entries[key]
+
+    def _start(self, email: str, secret: str) -> asyncio.Future:
+        key = (email.lower(), secret)
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = asyncio.ensure_future(self._render(email, secret))
+            # Retrieving the exception keeps a failed prefetch from being logged as unhandled
+            pending.add_done_callback(lambda f: (self._pending.pop(key, None), f.cancelled() or f.exception()))
+        return pending
+
+    async def get(self, email: str, secret: str) -> bytes:
+        png = self.peek(email, secret)
+        if png is not None:
+            return png
+        return await asyncio.shield(self._start(email, secret))
+
+    def prefetch(self, email: str, secret: str) -> None:
+        """Start rendering in the background so the image request finds it cached."""
+        if self.peek(email, secret) is None:
+            self._start(email, secret)
+
+    async def _render(self, email: str, secret: str) -> bytes:
+        executor = _get_executor()
+        if executor is None:
+            png = render_qr_png(email, secret)
+        else:
+            png = await asyncio.get_running_loop().run_in_executor(executor, render_qr_png, email, secret)
+        self.put(email, secret, png)
+        return png
+
+
+qr_cache = QRCodeCache()
+
+
+def shutdown_qr_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
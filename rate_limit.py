@@ -0,0 +1,232 @@
+import ipaddress
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from fastapi import HTTPException, Request
+from auth.otp_store import normalize_email
+from utils.metrics import counter
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_rate(value: str) -> Tuple[int, float]:
+    """"5/600" -> a bucket of 5 tokens that refills completely over 600 seconds."""
+    capacity, _, period = value.partition("/")
+    return int(capacity), float(period or 60)
+
+
+OTP_RATE_LIMIT_EMAIL = _parse_rate(os.getenv("OTP_RATE_LIMIT_EMAIL", "5/600"))
+OTP_RATE_LIMIT_IP = _parse_rate(os.getenv("OTP_RATE_LIMIT_IP", "30/60"))
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")  # memory | redis
+# Per scope (otp_ip, otp_email), so one kind of key cannot crowd out the other
+RATE_LIMIT_MAX_BUCKETS = int(os.getenv("RATE_LIMIT_MAX_BUCKETS", "100000"))
+# Scopes whose least recently used live bucket is evicted when full; other scopes reject new keys.
+# Email keys are free to make up, and the IP limit still applies to whoever floods them.
+RATE_LIMIT_EVICTABLE_SCOPES = frozenset(
+    filter(None, os.getenv("RATE_LIMIT_EVICTABLE_SCOPES", "otp_email").split(","))
+)
+RATE_LIMIT_SWEEP_INTERVAL_SECONDS = int(os.getenv("RATE_LIMIT_SWEEP_INTERVAL_SECONDS", "60"))
+# Only enable behind a proxy that overwrites X-Forwarded-For
+RATE_LIMIT_TRUST_FORWARDED_FOR = os.getenv("RATE_LIMIT_TRUST_FORWARDED_FOR", "false").lower() == "true"
+
+rate_limited = counter("rate_limited", "Requests rejected by a rate limiter", ("limit",))
+
+
+class RateLimiter:
+    """Token buckets keyed by an arbitrary string.
+
+    acquire() takes one token and returns 0, or returns how many seconds to
+    wait until a token is available. `scope` names the kind of key (it is
+    also the metric label); keys must already be unique across scopes.
+    """
+
+    async def acquire(self, key: str, capacity: int, period: float, scope: str = "default") -> float:
+        raise NotImplementedError
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated_at")
+
+    def __init__(self, tokens: float, updated_at: float):
+        self.tokens = tokens
+        self.updated_at = updated_at
+
+
+class MemoryRateLimiter(RateLimiter):
+    """Per-process buckets, at most max_buckets per scope.
+
+    Idle buckets (refilled to capacity) are dropped first. When a scope is
+    full of live buckets, an evictable scope drops its least recently used
+    bucket; any other scope rejects the new key rather than reset another
+    key's limit. So a flood of made-up emails can neither lock new client IPs
+    out nor reset an IP's limit.
+    """
+
+    def __init__(self, max_buckets: int = RATE_LIMIT_MAX_BUCKETS,
+                 sweep_interval: int = RATE_LIMIT_SWEEP_INTERVAL_SECONDS,
+                 evictable_scopes: frozenset = RATE_LIMIT_EVICTABLE_SCOPES):
+        self.max_buckets = max_buckets
+        self.sweep_interval = sweep_interval
+        self.evictable_scopes = evictable_scopes
+        # scope -> key -> (bucket, seconds for an empty bucket to refill)
+        self._scopes: "Dict[str, OrderedDict[str, tuple[_Bucket, float]]]" = {}
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + sweep_interval
+
+    def _sweep(self, now: float) -> None:
+        # Called with the lock held; a bucket idle long enough to be full again carries no state
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self.sweep_interval
+        for buckets in self._scopes.values():
+            idle = [key for key, (bucket, period) in buckets.items() if now - bucket.updated_at >= period]
+            for key in idle:
+                del buckets[key]
+
+    async def acquire(self, key: str, capacity: int, period: float, scope: str = "default") -> float:
+        now = time.monotonic()
+        rate = capacity / period
+        with self._lock:
+            self._sweep(now)
+            buckets = self._scopes.setdefault(scope, OrderedDict())
+            entry = buckets.get(key)
+            if entry is None:
+                # Buckets are kept in least-recently-updated order, so idle ones are at the front
+                while len(buckets) >= self.max_buckets:
+                    oldest, (oldest_bucket, oldest_period) = next(iter(buckets.items()))
+                    idle_for = now - oldest_bucket.updated_at
+                    if idle_for < oldest_period and scope not in self.evictable_scopes:
+                        return oldest_period - idle_for
+                    del buckets[oldest]
+                bucket = _Bucket(float(capacity), now)
+                buckets[key] = (bucket, period)
+            else:
+                bucket = entry[0]
+                bucket.tokens = min(capacity, bucket.tokens + (now - bucket.updated_at) * rate)
+                bucket.updated_at = now
+                buckets.move_to_end(key)
+            if bucket.tokens >= 1:
+                bucket.tokens -= 1
+                return 0.0
+            return (1 - bucket.tokens) / rate
+
+    def __len__(self) -> int:
+        return sum(len(buckets) for buckets in self._scopes.values())
+
+
+# KEYS[1] = bucket key; ARGV[1] = capacity, ARGV[2] = period (s)
+# Uses the server clock so every worker sees the same refill
+_ACQUIRE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local rate = capacity / period
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + (now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+else
+  wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(period * 1000))
+return tostring(wait)
+"""
+
+
+class RedisRateLimiter(RateLimiter):
+    """Shared buckets for multiple workers; idle buckets expire with the key TTL."""
+
+    def __init__(self, client=None, prefix: str = "ratelimit:"):
+        if client is None:
+            from utils.redis_client import get_redis
+            client = get_redis()
+        self.client = client
+        self.prefix = prefix
+        self._acquire = client.register_script(_ACQUIRE_SCRIPT)
+
+    async def acquire(self, key: str, capacity: int, period: float, scope: str = "default") -> float:
+        result = await self._acquire(keys=[f"{self.prefix}{key}"], args=[capacity, period])
+        return float(result)
+
+
+_limiter: Optional[RateLimiter] = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    global _limiter
+    if _limiter is None:
+        if RATE_LIMIT_BACKEND == "redis":
+            _limiter = RedisRateLimiter()
+        else:
+            _limiter = MemoryRateLimiter()
+    return _limiter
+
+
+def set_rate_limiter(limiter: RateLimiter) -> None:
+    global _limiter
+    _limiter = limiter
+
+
+_proxy_warning_logged = False
+
+
+def _warn_if_behind_proxy(host: str, forwarded: bool) -> None:
+    # Logged once per process, on the first request: behind a proxy every client shares the proxy's bucket
+    global _proxy_warning_logged
+    try:
+        private = ipaddress.ip_address(host).is_private
+    except ValueError:
+        private = False
+    if private or forwarded:
+        _proxy_warning_logged = True
+        logger.warning("Rate limiting by client address %s, which looks like a proxy (%s); all clients behind "
+                       "it share one bucket. Set RATE_LIMIT_TRUST_FORWARDED_FOR=true if the proxy overwrites "
+                       "X-Forwarded-For", host, "private address" if private else "X-Forwarded-For is set")
+
+
+def client_ip(request: Request) -> str:
+    if RATE_LIMIT_TRUST_FORWARDED_FOR:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",", 1)[0].strip()
+    host = request.client.host if request.client else "unknown"
+    if not _proxy_warning_logged:
+        _warn_if_behind_proxy(host, "x-forwarded-for" in request.headers)
+    return host
+
+
+def _reject(limit: str, retry_after: float):
+    rate_limited.labels(limit).inc()
+    raise HTTPException(
+        status_code=429,
+        detail="Too many OTP requests, try again later",
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+async def limit_otp_requests(request: Request) -> None:
+    """Route dependency for /request-otp; runs before any database or SMTP work."""
+    limiter = get_rate_limiter()
+    retry_after = await limiter.acquire(f"otp:ip:{client_ip(request)}", *OTP_RATE_LIMIT_IP, scope="otp_ip")
+    if retry_after:
+        _reject("otp_ip", retry_after)
+
+    try:
+        email = (await request.json()).get("email")
+    except Exception:
+        # Malformed bodies are left to the endpoint's own validation
+        return
+    if isinstance(email, str) and email:
+        retry_after = await limiter.acquire(f"otp:email:{normalize_email(email)}", *OTP_RATE_LIMIT_EMAIL,
+                                            scope="otp_email")
+        if retry_after:
+            _reject("otp_email", retry_after)
@@ -0,0 +1,22 @@
+import os
+from typing import Optional
+
+REDIS_URL = os.getenv("REDIS_URL")
+
+_client = None
+
+
+def get_redis(url: Optional[str] = None):
+    """Return a shared redis.asyncio client, created on first use.
+
+    Anything speaking the Redis protocol works here (Redis, Valkey, KeyDB,
+    or a local fake in development).
+    """
+    global _client
+    url = url or REDIS_URL
+    if not url:
+        raise RuntimeError("REDIS_URL is not configured")
+    if _client is None:
+        import redis.asyncio as redis
+        _client = redis.from_url(url, decode_responses=True)
+    return _client
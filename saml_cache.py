@@ -0,0 +1,109 @@
+import hashlib
+import os
+import threading
+import time
+from typing import Optional, Tuple
+from fastapi import Request
+
+SAML_CONFIG_PATH = os.getenv("SAML_CONFIG_PATH", "saml_config.json")
+IDP_METADATA_PATH = os.getenv("AZURE_METADATA_XML_PATH", "idp_metadata.xml")
+# How often the config files are stat()-ed for changes; 0 checks on every call
+SAML_SETTINGS_CHECK_INTERVAL = float(os.getenv("SAML_SETTINGS_CHECK_INTERVAL", "5"))
+
+
+def _files_fingerprint() -> Tuple:
+    fingerprint = []
+    for path in (SAML_CONFIG_PATH, IDP_METADATA_PATH):
+        try:
+            stat = os.stat(path)
+            fingerprint.append((path, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            fingerprint.append((path, None, None))
+    return tuple(fingerprint)
+
+
+class SamlSettingsCache:
+    """Builds the OneLogin settings once and rebuilds them only when the
+    SAML config or the IdP metadata file changes on disk.
+
+    The SP metadata XML and its ETag are derived from the same settings
+    generation, so they are rebuilt together with it.
+    """
+
+    def __init__(self, check_interval: float = SAML_SETTINGS_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._settings = None
+        self._fingerprint = None
+        self._next_check = 0.0
+        self._metadata: Optional[Tuple[bytes, str]] = None
+        self.generation = 0
+
+    def _refresh_if_stale(self) -> None:
+        now = time.monotonic()
+        if self._settings is not None and now < self._next_check:
+            return
+        with self._lock:
+            if self._settings is not None and now < self._next_check:
+                return
+            fingerprint = _files_fingerprint()
+            if self._settings is None or fingerprint != self._fingerprint:
+                # OneLogin (and xmlsec behind it) is only loaded once SAML is actually used
+                from utils.saml import get_saml_settings as build_saml_settings
+                self._settings = build_saml_settings()
+                self._fingerprint = fingerprint
+                self._metadata = None
+                self.generation += 1
+            self._next_check = now + self.check_interval
+
+    def settings(self):
+        self._refresh_if_stale()
+        return self._settings
+
+    def sp_metadata(self) -> Tuple[bytes, str]:
+        self._refresh_if_stale()
+        metadata = self._metadata
+        if metadata is None:
+            from onelogin.saml2.metadata import OneLogin_Saml2_Metadata
+            settings = self._settings
+            xml, errors = OneLogin_Saml2_Metadata.builder(settings._sp, settings._security)
+            if errors:
+                raise ValueError(f"Metadata error: {errors}")
+            body = xml.encode("utf-8") if isinstance(xml, str) else xml
+            metadata = (body, '"%s"' % hashlib.sha256(body).hexdigest()[:32])
+            self._metadata = metadata
+        return metadata
+
+    def clear(self) -> None:
+        with self._lock:
+            self._settings = None
+            self._metadata = None
+
+
+saml_settings_cache = SamlSettingsCache()
+
+
+def get_saml_settings():
+    return saml_settings_cache.settings()
+
+
+def get_sp_metadata() -> Tuple[bytes, str]:
+    return saml_settings_cache.sp_metadata()
+
+
+async def prepare_saml_request(request: Request) -> dict:
+    form = await request.form() if request.method == "POST" else {}
+    return {
+        "https": "on" if request.url.scheme == "https" else "off",
+        "http_host": request.url.hostname,
+        "server_port": request.url.port or (443 if request.url.scheme == "https" else 80),
+        "script_name": request.url.path,
+        "get_data": dict(request.query_params),
+        "post_data": dict(form),
+    }
+
+
+async def init_saml_auth(request: Request):
+    from onelogin.saml2.auth import OneLogin_Saml2_Auth
+    req = await prepare_saml_request(request)
+    return OneLogin_Saml2_Auth(req, old_settings=get_saml_settings())
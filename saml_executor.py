@@ -0,0 +1,123 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from utils.metrics import saml_acs_queue_duration, saml_duration
+
+SAML_ACS_EXECUTOR = os.getenv("SAML_ACS_EXECUTOR", "thread")  # thread | process | inline
+SAML_ACS_WORKERS = int(os.getenv("SAML_ACS_WORKERS", str(min(4, os.cpu_count() or 1))))
+SAML_ACS_MAX_CONCURRENCY = int(os.getenv("SAML_ACS_MAX_CONCURRENCY", str(SAML_ACS_WORKERS * 2)))
+
+
+@dataclass
+class AcsResult:
+    """Picklable outcome of validating a SAML response, so it can cross a process pool."""
+    errors: List[str]
+    error_reason: Optional[str]
+    authenticated: bool
+    attributes: Dict[str, List[str]]
+    in_response_to: Optional[str]
+    # time.time() when a worker picked the job up; used for the queue-time metric
+    started_at: float = field(default=0.0)
+
+
+def run_acs(req: dict) -> AcsResult:
+    """Parse, canonicalise and verify a SAML response. CPU-bound; runs in the pool."""
+    started_at = time.time()
+    from onelogin.saml2.auth import OneLogin_Saml2_Auth
+    from utils.saml_cache import get_saml_settings
+    saml_auth = OneLogin_Saml2_Auth(req, old_settings=get_saml_settings())
+    saml_auth.process_response()
+    return AcsResult(
+        errors=saml_auth.get_errors(),
+        error_reason=saml_auth.get_last_error_reason(),
+        authenticated=saml_auth.is_authenticated(),
+        attributes=saml_auth.get_attributes(),
+        in_response_to=saml_auth.get_last_response_in_response_to(),
+        started_at=started_at,
+    )
+
+
+class AcsStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.in_flight = 0
+        self.queue_time_total = 0.0
+        self.queue_time_max = 0.0
+        self.run_time_total = 0.0
+
+    def record(self, queue_time: float, run_time: float) -> None:
+        with self._lock:
+            self.completed += 1
+            self.queue_time_total += queue_time
+            self.queue_time_max = max(self.queue_time_max, queue_time)
+            self.run_time_total += run_time
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            completed = self.completed or 1
+            return {
+                "completed": self.completed,
+                "in_flight": self.in_flight,
+                "queue_time_avg_seconds": self.queue_time_total / completed,
+                "queue_time_max_seconds": self.queue_time_max,
+                "run_time_avg_seconds": self.run_time_total / completed,
+            }
+
+
+acs_stats = AcsStats()
+
+_executor: Optional[Executor] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _get_executor() -> Optional[Executor]:
+    global _executor
+    if _executor is None and SAML_ACS_EXECUTOR != "inline":
+        if SAML_ACS_EXECUTOR == "process":
+            _executor = ProcessPoolExecutor(max_workers=SAML_ACS_WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=SAML_ACS_WORKERS, thread_name_prefix="saml-acs")
+    return _executor
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(SAML_ACS_MAX_CONCURRENCY)
+    return _semaphore
+
+
+async def process_acs_response(req: dict) -> AcsResult:
+    """Validate a SAML response without blocking the event loop.
+
+    At most SAML_ACS_MAX_CONCURRENCY validations are submitted at once; the
+    queue time covers both waiting for that limit and waiting for a worker.
+    """
+    submitted_at = time.time()
+    async with _get_semaphore():
+        acs_stats.in_flight += 1
+        try:
+            executor = _get_executor()
+            if executor is None:
+                result = run_acs(req)
+            else:
+                result = await asyncio.get_running_loop().run_in_executor(executor, run_acs, req)
+        finally:
+            acs_stats.in_flight -= 1
+    queue_time, run_time = result.started_at - submitted_at, time.time() - result.started_at
+    acs_stats.record(queue_time, run_time)
+    saml_acs_queue_duration.observe(queue_time)
+    saml_duration.labels("acs").observe(run_time)
+    return result
+
+
+def shutdown_acs_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
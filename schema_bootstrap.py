@@ -0,0 +1,137 @@
+import hashlib
+import importlib
+import logging
+import pkgutil
+import time
+from typing import Optional
+from sqlalchemy import Column, Integer, MetaData, String, Table, inspect, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.schema import CreateColumn, CreateIndex, CreateTable
+import models
+from models.base import Base
+
+logger = logging.getLogger(__name__)
+
+
+def import_models() -> None:
+    """Import every module under models/ so all of their tables are on Base.metadata.
+
+    Discovered rather than listed, so a new model file is bootstrapped (and
+    fingerprinted) without touching this module.
+    """
+    for module in pkgutil.iter_modules(models.__path__):
+        importlib.import_module(f"{models.__name__}.{module.name}")
+
+
+import_models()
+
+# Kept off Base.metadata so it is not part of the fingerprint it stores
+_bootstrap_metadata = MetaData()
+schema_fingerprints = Table(
+    "schema_fingerprints",
+    _bootstrap_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("fingerprint", String(64), nullable=False),
+    Column("applied_at", Integer, nullable=False),
+)
+# Serialises bootstraps from workers starting at the same time
+_ADVISORY_LOCK_KEY = 0x5C4E3A
+
+# Columns added to tables that already exist in deployed databases. create_all
+# never alters a table, so these are added with ALTER TABLE ... ADD COLUMN,
+# using the column definition from the model. Only list nullable columns (or
+# ones with a server default), since existing rows get no value.
+ADDED_COLUMNS = {
+    "customers": ("mfa_last_totp_step",),
+    "email_logs": ("context", "created_at", "next_attempt_at"),
+}
+
+
+def schema_fingerprint(metadata: MetaData = Base.metadata) -> str:
+    """SHA-256 of the PostgreSQL DDL for every table and index in the models."""
+    dialect = postgresql.dialect()
+    digest = hashlib.sha256()
+    # A database fingerprinted before a column was listed here is checked again
+    digest.update(repr(sorted(ADDED_COLUMNS.items())).encode())
+    for table in metadata.sorted_tables:
+        digest.update(str(CreateTable(table).compile(dialect=dialect)).encode())
+        for index in sorted(table.indexes, key=lambda index: index.name or ""):
+            digest.update(str(CreateIndex(index).compile(dialect=dialect)).encode())
+    return digest.hexdigest()
+
+
+async def _stored_fingerprint(conn) -> Optional[str]:
+    if (await conn.execute(text("SELECT to_regclass('schema_fingerprints')"))).scalar() is None:
+        return None
+    return (await conn.execute(
+        select(schema_fingerprints.c.fingerprint).where(schema_fingerprints.c.id == 1)
+    )).scalar()
+
+
+def _add_columns(sync_conn, table: Table, columns: set) -> None:
+    preparer = sync_conn.dialect.identifier_preparer
+    for name in ADDED_COLUMNS.get(table.name, ()):
+        if name in columns:
+            continue
+        definition = CreateColumn(table.c[name]).compile(dialect=sync_conn.dialect)
+        sync_conn.execute(text(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {definition}"))
+        columns.add(name)
+        logger.info("Added column %s.%s", table.name, name)
+
+
+class SchemaDriftError(RuntimeError):
+    """Model columns are missing from the database and need a real migration."""
+
+
+def _apply(sync_conn, metadata: MetaData) -> None:
+    # create_all only adds missing tables; listed columns and indexes on existing tables are added one by one
+    existing = set(inspect(sync_conn).get_table_names())
+    metadata.create_all(sync_conn, checkfirst=True)
+    _bootstrap_metadata.create_all(sync_conn, checkfirst=True)
+    inspector = inspect(sync_conn)
+    drift = []
+    for table in metadata.sorted_tables:
+        if table.name not in existing:
+            continue
+        # Columns first: an index may cover a column added here
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        _add_columns(sync_conn, table, columns)
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+        # Other column changes need a real migration; they are not applied here
+        drift.extend(f"{table.name}.{column.name}" for column in table.columns if column.name not in columns)
+    if drift:
+        # Raised inside the bootstrap transaction, so nothing is applied and no fingerprint is stored:
+        # every start fails the same way until the columns exist
+        raise SchemaDriftError(f"Missing columns {', '.join(drift)}; run a migration or add them to ADDED_COLUMNS")
+
+
+async def ensure_schema(engine: AsyncEngine, metadata: MetaData = Base.metadata) -> bool:
+    """Bring the database up to the models; returns False when it already was.
+
+    A current schema costs one or two queries and no DDL, so this is safe to
+    run on every deploy or worker start. Raises SchemaDriftError, and records
+    nothing, while a model column is missing that ADDED_COLUMNS does not cover.
+    """
+    fingerprint = schema_fingerprint(metadata)
+    async with engine.connect() as conn:
+        if await _stored_fingerprint(conn) == fingerprint:
+            return False
+
+    async with engine.begin() as conn:
+        await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+        # Another worker may have finished the bootstrap while this one waited for the lock
+        if await _stored_fingerprint(conn) == fingerprint:
+            return False
+        started = time.perf_counter()
+        await conn.run_sync(_apply, metadata)
+        await conn.execute(
+            insert(schema_fingerprints)
+            .values(id=1, fingerprint=fingerprint, applied_at=int(time.time()))
+            .on_conflict_do_update(index_elements=[schema_fingerprints.c.id],
+                                   set_={"fingerprint": fingerprint, "applied_at": int(time.time())})
+        )
+    logger.info("Schema bootstrapped to %s in %.2fs", fingerprint[:12], time.perf_counter() - started)
+    return True
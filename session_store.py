@@ -0,0 +1,177 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from config import WEB_CONCURRENCY
+
+SSO_SESSION_TTL_SECONDS = int(os.getenv("SSO_SESSION_TTL_SECONDS", "600"))
+SSO_SESSION_MAX_ENTRIES = int(os.getenv("SSO_SESSION_MAX_ENTRIES", "50000"))
+# sqlite is shared by the workers on one host; use redis when workers run on several hosts
+SSO_SESSION_BACKEND = os.getenv("SSO_SESSION_BACKEND", "sqlite")  # sqlite | redis | memory
+SSO_SESSION_SQLITE_PATH = os.getenv("SSO_SESSION_SQLITE_PATH", "sso_sessions.db")
+
+
+class SessionStore:
+    """Short-lived SSO sessions keyed by the SAML AuthnRequest ID.
+
+    Entries expire after `ttl` seconds and the oldest entries are evicted once
+    `max_entries` is exceeded. pop() is a single keyed delete, so consuming a
+    session in the ACS callback is O(1).
+    """
+
+    def __init__(self, ttl: int = SSO_SESSION_TTL_SECONDS, max_entries: int = SSO_SESSION_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    async def put(self, key: str, value: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    async def pop(self, key: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    """Per-process store; only suitable when running a single worker."""
+
+    def __init__(self, ttl: int = SSO_SESSION_TTL_SECONDS, max_entries: int = SSO_SESSION_MAX_ENTRIES):
+        super().__init__(ttl, max_entries)
+        self._entries: "OrderedDict[str, tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def put(self, key: str, value: Dict[str, Any]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = (now + self.ttl, value)
+            self._entries.move_to_end(key)
+            # Insertion order is expiry order, so expired entries sit at the front
+            while self._entries:
+                oldest_key, (expires_at, _) = next(iter(self._entries.items()))
+                if expires_at > now and len(self._entries) <= self.max_entries:
+                    break
+                del self._entries[oldest_key]
+
+    async def pop(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[1]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Shares sessions between workers on one host through a WAL-mode SQLite file."""
+
+    def __init__(self, path: str = SSO_SESSION_SQLITE_PATH, ttl: int = SSO_SESSION_TTL_SECONDS,
+                 max_entries: int = SSO_SESSION_MAX_ENTRIES):
+        super().__init__(ttl, max_entries)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sso_sessions ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_sso_sessions_expires_at ON sso_sessions (expires_at)")
+
+    def _put(self, key: str, value: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO sso_sessions (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), now + self.ttl),
+                )
+                self._conn.execute("DELETE FROM sso_sessions WHERE expires_at <= ?", (now,))
+                # Every entry shares the same TTL, so the smallest expires_at is the oldest entry
+                self._conn.execute(
+                    "DELETE FROM sso_sessions WHERE expires_at < ("
+                    "SELECT expires_at FROM sso_sessions ORDER BY expires_at DESC LIMIT 1 OFFSET ?)",
+                    (self.max_entries - 1,),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _pop(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "DELETE FROM sso_sessions WHERE key = ? RETURNING value, expires_at", (key,)
+            ).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return json.loads(row[0])
+
+    async def put(self, key: str, value: Dict[str, Any]) -> None:
+        await asyncio.to_thread(self._put, key, value)
+
+    async def pop(self, key: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._pop, key)
+
+
+class RedisSessionStore(SessionStore):
+    """Shares sessions across hosts through any Redis-protocol server.
+
+    A sorted set ordered by creation time backs the max_entries bound; the
+    session keys themselves expire through the server's TTL.
+    """
+
+    def __init__(self, client=None, ttl: int = SSO_SESSION_TTL_SECONDS, max_entries: int = SSO_SESSION_MAX_ENTRIES,
+                 prefix: str = "sso:"):
+        super().__init__(ttl, max_entries)
+        if client is None:
+            from utils.redis_client import get_redis
+            client = get_redis()
+        self.client = client
+        self.prefix = prefix
+        self.index_key = f"{prefix}index"
+
+    async def put(self, key: str, value: Dict[str, Any]) -> None:
+        now = time.time()
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.set(self.prefix + key, json.dumps(value), ex=self.ttl)
+            pipe.zadd(self.index_key, {key: now})
+            pipe.zremrangebyscore(self.index_key, "-inf", now - self.ttl)
+            pipe.zcard(self.index_key)
+            results = await pipe.execute()
+        overflow = results[-1] - self.max_entries
+        if overflow > 0:
+            evicted = await self.client.zpopmin(self.index_key, overflow)
+            if evicted:
+                await self.client.delete(*(self.prefix + member for member, _ in evicted))
+
+    async def pop(self, key: str) -> Optional[Dict[str, Any]]:
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.getdel(self.prefix + key)
+            pipe.zrem(self.index_key, key)
+            value, _ = await pipe.execute()
+        return json.loads(value) if value is not None else None
+
+
+_store: Optional[SessionStore] = None
+
+
+def get_session_store() -> SessionStore:
+    global _store
+    if _store is None:
+        if SSO_SESSION_BACKEND == "redis":
+            _store = RedisSessionStore()
+        elif SSO_SESSION_BACKEND == "memory":
+            # The ACS callback can land on any worker and must find the session created by /login
+            if WEB_CONCURRENCY > 1:
+                raise RuntimeError("SSO_SESSION_BACKEND=memory keeps sessions per process and cannot be used "
+                                   "with WEB_CONCURRENCY > 1; use sqlite or redis")
+            _store = MemorySessionStore()
+        else:
+            _store = SQLiteSessionStore()
+    return _store
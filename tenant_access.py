@@ -0,0 +1,76 @@
+import uuid
+from typing import Optional
+from fastapi import Depends, HTTPException
+from sqlalchemy import exists, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from auth.tokens import AZURE_IDP, Principal, get_current_principal
+from database import get_read_db
+from models.consultant import Consultant, ConsultantRole
+from models.customer_consultant import CustomerConsultant
+from utils.customer_cache import get_customer_auth
+
+
+def _forbidden(detail: str) -> HTTPException:
+    return HTTPException(status_code=403, detail=detail)
+
+
+async def _load_consultant(db: AsyncSession, principal: Principal, customer_id: Optional[uuid.UUID] = None):
+    """(id, role[, assigned]) of the consultant behind an Azure-issued token, or None.
+
+    Consultants are matched on the token's immutable Azure object id (oid),
+    never on an email or username claim, which users or admins can change.
+    Customer tokens never resolve to a consultant.
+    """
+    oid = principal.claims.get("oid")
+    if principal.claims.get("idp") != AZURE_IDP or not oid:
+        return None
+    columns = [Consultant.id, Consultant.role]
+    if customer_id is not None:
+        columns.append(exists().where(CustomerConsultant.consultant_id == Consultant.id,
+                                      CustomerConsultant.customer_id == customer_id).label("assigned"))
+    return (await db.execute(select(*columns).where(Consultant.azure_id == oid))).first()
+
+
+async def authorize_customer(
+    customer_id: uuid.UUID,
+    principal: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_read_db),
+) -> Principal:
+    """Route dependency for /customers/{customer_id}/...: the customer themselves,
+    or a consultant assigned to them through customer_consultants."""
+    if principal.claims.get("idp") == AZURE_IDP:
+        consultant = await _load_consultant(db, principal, customer_id)
+        if consultant is not None and consultant.assigned:
+            return principal
+    else:
+        customer = principal.customer or await get_customer_auth(principal.subject, db)
+        if customer is not None and customer.id == customer_id:
+            return principal
+    raise _forbidden("Not allowed to access this customer")
+
+
+async def authorize_consultant(
+    consultant_id: uuid.UUID,
+    principal: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_read_db),
+) -> Principal:
+    """Route dependency for /consultants/{consultant_id}/...: that consultant only."""
+    consultant = await _load_consultant(db, principal)
+    if consultant is not None and consultant.id == consultant_id:
+        return principal
+    raise _forbidden("Not allowed to access this consultant")
+
+
+async def authorize_admin(
+    principal: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_read_db),
+) -> Principal:
+    """Route dependency for changes to customer assignments: admin consultants only.
+
+    Any Azure AD user who signs in through SSO becomes a consultant, so a
+    consultant must not be able to assign customers, not even to themselves.
+    """
+    consultant = await _load_consultant(db, principal)
+    if consultant is not None and consultant.role == ConsultantRole.ADMIN:
+        return principal
+    raise _forbidden("Only admins can change customer assignments")
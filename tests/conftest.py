@@ -0,0 +1,38 @@
+import os
+import sys
+from contextlib import contextmanager
+import pytest
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def count_queries():
+    """Context manager that collects the SQL statements run on the app's engine inside it.
+
+        with count_queries() as statements:
+            await client.post(...)
+        assert len(statements) <= budget
+    """
+    from database import engine
+
+    @contextmanager
+    def counting():
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine.sync_engine, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+    return counting
@@ -0,0 +1,30 @@
+import datetime
+import uuid
+import pytest
+from utils.alert_query import InvalidQuery, decode_page_token, encode_page_token
+
+ALERT_TIME = datetime.datetime(2024, 5, 1, 12, 30, tzinfo=datetime.timezone.utc)
+ALERT_ID = uuid.UUID("5b0f7c0e-7d1a-4d55-9a8e-2f4b3c1d0e9f")
+
+
+def test_page_token_round_trip():
+    token = encode_page_token(ALERT_TIME, ALERT_ID, "query-a")
+    assert decode_page_token(token, "query-a") == (ALERT_TIME, ALERT_ID)
+
+
+def test_page_token_is_bound_to_its_query():
+    token = encode_page_token(ALERT_TIME, ALERT_ID, "query-a")
+    with pytest.raises(InvalidQuery, match="does not match"):
+        decode_page_token(token, "query-b")
+
+
+@pytest.mark.parametrize("tamper", [
+    lambda token: token[:-1] + ("0" if token[-1] != "0" else "1"),
+    lambda token: "A" + token[1:],
+    lambda token: token.split(".")[0],
+    lambda token: "",
+])
+def test_tampered_page_token(tamper):
+    token = encode_page_token(ALERT_TIME, ALERT_ID, "query-a")
+    with pytest.raises(InvalidQuery, match="Invalid page token"):
+        decode_page_token(tamper(token), "query-a")
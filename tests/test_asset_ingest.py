@@ -0,0 +1,29 @@
+import pytest
+from utils.asset_ingest import iter_lines
+
+pytestmark = pytest.mark.anyio
+
+
+async def lines(chunks, max_line_bytes=16):
+    async def stream():
+        for chunk in chunks:
+            yield chunk
+    return [line async for line in iter_lines(stream(), max_line_bytes)]
+
+
+async def test_lines_split_across_chunks():
+    assert await lines([b'{"a"', b':1}\n{"b":2', b"}\n"]) == [b'{"a":1}', b'{"b":2}']
+
+
+async def test_trailing_line_without_newline():
+    assert await lines([b"one\ntwo"]) == [b"one", b"two"]
+    assert await lines([b"one\n  \n"]) == [b"one", b"  "]
+    assert await lines([b"one\n  "]) == [b"one"]
+
+
+async def test_oversized_line_is_none_and_stream_continues():
+    assert await lines([b"ok\n", b"x" * 20, b"x" * 20, b"tail\nnext\n"]) == [b"ok", None, b"next"]
+
+
+async def test_oversized_trailing_line():
+    assert await lines([b"ok\n", b"x" * 40]) == [b"ok", None]
@@ -0,0 +1,118 @@
+"""Auth endpoints against a real database, with their SQL statement budgets.
+
+The budgets are the ones the auth-flows benchmark gates on
+(benchmarks/auth_flows_baseline.json) and are checked with a cold customer
+cache, the worst case. Needs DATABASE_URL (Postgres); skipped otherwise.
+"""
+import json
+import os
+import uuid
+import pytest
+
+if not os.getenv("DATABASE_URL"):
+    pytest.skip("DATABASE_URL is not set", allow_module_level=True)
+
+import httpx
+import pyotp
+from sqlalchemy import delete
+from main import app
+from database import SessionLocal, engine
+from models.base import Base
+from models.customer import Customer
+from models.pending_otp import PendingOTP
+from auth.otp_store import get_otp_store
+from utils.customer_cache import customer_cache
+
+pytestmark = pytest.mark.anyio
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             "benchmarks", "auth_flows_baseline.json")
+with open(BASELINE_PATH) as baseline:
+    QUERY_BUDGETS = json.load(baseline)["query_budgets"]
+
+OTP = "123456"
+
+
+@pytest.fixture
+async def client():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=[Customer.__table__, PendingOTP.__table__])
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+    # Pooled asyncpg connections belong to this test's event loop
+    await engine.dispose()
+
+
+@pytest.fixture
+async def customer(client):
+    """An approved customer with a pending OTP; `mfa_enabled` enrols them with a TOTP secret."""
+    created = []
+
+    async def make(mfa_enabled: bool):
+        email = f"pytest-{uuid.uuid4().hex}@example.com"
+        secret = pyotp.random_base32() if mfa_enabled else None
+        async with SessionLocal() as db:
+            db.add(Customer(id=uuid.uuid4(), customer_email=email, customer_name="Pytest", customer_status="APPROVED",
+                            customer_email_verified=True, is_mfa_enabled=mfa_enabled, mfa_secret=secret,
+                            assigned_consultant_ids=[]))
+            await get_otp_store().put(email, OTP, db)
+            await db.commit()
+        created.append(email)
+        customer_cache.clear()
+        return email, secret
+
+    yield make
+    async with SessionLocal() as db:
+        await db.execute(delete(PendingOTP).where(PendingOTP.email.in_(created)))
+        await db.execute(delete(Customer).where(Customer.customer_email.in_(created)))
+        await db.commit()
+    customer_cache.clear()
+
+
+async def test_verify_otp_starts_enrolment(client, customer, count_queries):
+    email, _ = await customer(mfa_enabled=False)
+    with count_queries() as statements:
+        response = await client.post("/verify-otp", json={"email": email, "otp": OTP})
+    assert response.status_code == 200, response.text
+    assert response.json()["mfa_setup"] is False
+    assert response.json()["enrolment_token"]
+    assert len(statements) <= QUERY_BUDGETS["POST /verify-otp"], statements
+
+
+async def test_verify_otp_consumes_the_code(client, customer):
+    email, _ = await customer(mfa_enabled=True)
+    response = await client.post("/verify-otp", json={"email": email, "otp": OTP})
+    assert response.status_code == 200, response.text
+    assert response.json() == {"message": "MFA already setup", "mfa_setup": True}
+    response = await client.post("/verify-otp", json={"email": email, "otp": OTP})
+    assert response.status_code == 401
+
+
+async def test_verify_totp(client, customer, count_queries):
+    email, secret = await customer(mfa_enabled=True)
+    code = pyotp.TOTP(secret).now()
+    with count_queries() as statements:
+        response = await client.post("/verify-totp", json={"email": email, "totp": code})
+    assert response.status_code == 200, response.text
+    assert len(statements) <= QUERY_BUDGETS["POST /verify-totp"], statements
+    # The step is recorded, so the same code cannot be replayed
+    response = await client.post("/verify-totp", json={"email": email, "totp": code})
+    assert response.status_code == 401
+
+
+async def test_mfa_login(client, customer, count_queries):
+    email, secret = await customer(mfa_enabled=True)
+    with count_queries() as statements:
+        response = await client.post("/mfa-login",
+                                     json={"email": email, "otp": OTP, "totp": pyotp.TOTP(secret).now()})
+    assert response.status_code == 200, response.text
+    assert response.json()["token_type"] == "bearer"
+    assert len(statements) <= QUERY_BUDGETS["POST /mfa-login"], statements
+
+
+async def test_mfa_login_rejects_wrong_otp(client, customer):
+    email, secret = await customer(mfa_enabled=True)
+    response = await client.post("/mfa-login",
+                                 json={"email": email, "otp": "000000", "totp": pyotp.TOTP(secret).now()})
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Invalid OTP"
@@ -0,0 +1,48 @@
+import asyncio
+import pytest
+from auth.rate_limit import MemoryRateLimiter
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_bucket_empties_then_asks_to_wait():
+    limiter = MemoryRateLimiter()
+    assert [await limiter.acquire("k", 3, 60) for _ in range(3)] == [0, 0, 0]
+    wait = await limiter.acquire("k", 3, 60)
+    assert 19 < wait <= 20
+
+
+async def test_scopes_do_not_share_buckets():
+    limiter = MemoryRateLimiter()
+    assert await limiter.acquire("k", 1, 60, scope="otp_ip") == 0
+    assert await limiter.acquire("k", 1, 60, scope="otp_email") == 0
+    assert await limiter.acquire("k", 1, 60, scope="otp_ip") > 0
+
+
+async def test_full_evictable_scope_drops_least_recently_used():
+    limiter = MemoryRateLimiter(max_buckets=2, evictable_scopes=frozenset({"otp_email"}))
+    for key in ("a", "b"):
+        assert await limiter.acquire(key, 1, 60, scope="otp_email") == 0
+    assert await limiter.acquire("c", 1, 60, scope="otp_email") == 0
+    assert len(limiter) == 2
+    # "a" was evicted and starts over; "c" kept its state
+    assert await limiter.acquire("a", 1, 60, scope="otp_email") == 0
+    assert await limiter.acquire("c", 1, 60, scope="otp_email") > 0
+
+
+async def test_full_scope_rejects_new_keys_without_resetting_live_ones():
+    limiter = MemoryRateLimiter(max_buckets=2, evictable_scopes=frozenset({"otp_email"}))
+    for key in ("a", "b"):
+        assert await limiter.acquire(key, 1, 60, scope="otp_ip") == 0
+    assert await limiter.acquire("c", 1, 60, scope="otp_ip") > 0
+    assert await limiter.acquire("a", 1, 60, scope="otp_ip") > 0
+    # Another scope has its own cap
+    assert await limiter.acquire("c", 1, 60, scope="otp_email") == 0
+
+
+async def test_idle_bucket_makes_room_in_a_full_scope():
+    limiter = MemoryRateLimiter(max_buckets=1, evictable_scopes=frozenset())
+    assert await limiter.acquire("a", 1, 0.01, scope="otp_ip") == 0
+    await asyncio.sleep(0.02)
+    assert await limiter.acquire("b", 1, 0.01, scope="otp_ip") == 0
+    assert len(limiter) == 1
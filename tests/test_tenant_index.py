@@ -0,0 +1,67 @@
+from utils.asset_search import TenantIndex
+
+
+def asset(external_id, deleted=False, **columns):
+    row = {
+        "external_asset_id": external_id,
+        "deleted": deleted,
+        "risk_grade": None,
+        "vpc_external_asset_id": None,
+        "cloud_type": None,
+        "asset_class": None,
+        "service_name": None,
+        "ip_addresses": None,
+        "tags": None,
+    }
+    row.update(columns)
+    return row
+
+
+def snapshot(rows):
+    """A TenantIndex as AssetBitmapIndex.build leaves it: rows applied in id order."""
+    index = TenantIndex()
+    index.apply(sorted(rows, key=lambda row: row["external_asset_id"]))
+    index.sorted_upto = len(index.ids)
+    return index
+
+
+def test_groups_are_anded_and_values_ored():
+    index = snapshot([
+        asset("a1", cloud_type="aws", risk_grade="A"),
+        asset("a2", cloud_type="gcp", risk_grade="A"),
+        asset("a3", cloud_type="aws", risk_grade="C"),
+        asset("a4", cloud_type="azure", risk_grade="A", tags={"env": "prod"}),
+    ])
+    assert index.query([[("cloud_type", "aws"), ("cloud_type", "azure")], [("risk_grade", "A")]], None, 10) == \
+        (["a1", "a4"], 2)
+    assert index.query([[("tag", "env")]], None, 10) == (["a4"], 1)
+    assert index.query([[("tag", "env", "dev")]], None, 10) == ([], 0)
+    assert index.query([], None, 10) == (["a1", "a2", "a3", "a4"], 4)
+
+
+def test_updates_and_deletes_replace_terms():
+    index = snapshot([asset("a1", cloud_type="aws", ip_addresses=["10.0.0.1"]), asset("a2", cloud_type="aws")])
+    index.apply([asset("a1", cloud_type="gcp"), asset("a2", deleted=True)])
+    assert index.query([[("cloud_type", "aws")]], None, 10) == ([], 0)
+    assert index.query([[("ip", "10.0.0.1")]], None, 10) == ([], 0)
+    assert index.query([[("cloud_type", "gcp")]], None, 10) == (["a1"], 1)
+    assert index.query([], None, 10) == (["a1"], 1)
+
+
+def test_pages_in_id_order_across_dense_postings_and_appended_assets():
+    # Enough assets that the shared terms are stored as bitsets
+    index = snapshot([asset(f"a{i:04d}", cloud_type="aws") for i in range(0, 400, 2)])
+    assert not isinstance(index.postings[("cloud_type", "aws")], set)
+    # Added after the snapshot, so they sit past sorted_upto out of id order
+    index.apply([asset("a0333", cloud_type="aws"), asset("a0001", cloud_type="aws"), asset("zzz", cloud_type="gcp")])
+    expected = sorted([f"a{i:04d}" for i in range(0, 400, 2)] + ["a0001", "a0333"])
+
+    pages, after = [], None
+    while True:
+        ids, total = index.query([[("cloud_type", "aws")]], after, 25)
+        assert total == len(expected)
+        if not ids:
+            break
+        pages.extend(ids)
+        after = ids[-1]
+    assert pages == expected
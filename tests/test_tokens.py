@@ -0,0 +1,35 @@
+import time
+from auth.tokens import VerifiedTokenCache
+
+
+def claims(subject, ttl=60):
+    return {"sub": subject, "exp": int(time.time()) + ttl}
+
+
+def test_hit_returns_cached_claims():
+    cache = VerifiedTokenCache()
+    entry = claims("a@example.com")
+    cache.put(b"a", entry)
+    assert cache.get(b"a") == entry
+    assert cache.get(b"b") is None
+
+
+def test_entry_never_outlives_token_expiry():
+    cache = VerifiedTokenCache()
+    cache.put(b"expired", claims("a@example.com", ttl=-1))
+    assert cache.get(b"expired") is None
+    # Dropped on the miss, not just hidden
+    cache.put(b"live", claims("b@example.com"))
+    assert cache.get(b"live") is not None
+    assert list(cache._entries) == [b"live"]
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = VerifiedTokenCache(max_entries=2)
+    cache.put(b"a", claims("a@example.com"))
+    cache.put(b"b", claims("b@example.com"))
+    assert cache.get(b"a") is not None
+    cache.put(b"c", claims("c@example.com"))
+    assert cache.get(b"b") is None
+    assert cache.get(b"a") is not None
+    assert cache.get(b"c") is not None
@@ -0,0 +1,155 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+import jwt
+from fastapi import Depends, HTTPException
+from fastapi.security import OAuth2PasswordBearer
+from utils.customer_cache import CustomerAuth, customer_cache
+
+SECRET_KEY = os.getenv("SECRET_KEY", "SECRET_KEY")
+ALGORITHM = "HS256"
+ACCESS_TOKEN_EXPIRE_MINUTES = 60
+# "kid1:secret1,kid2:secret2"; new tokens are signed with JWT_ACTIVE_KID and
+# every listed key is accepted, so a key can be retired once its tokens expire
+JWT_SIGNING_KEYS = os.getenv("JWT_SIGNING_KEYS", "")
+JWT_ACTIVE_KID = os.getenv("JWT_ACTIVE_KID")
+VERIFIED_TOKEN_CACHE_SIZE = int(os.getenv("VERIFIED_TOKEN_CACHE_SIZE", "10000"))
+# Scoped tokens carry a "purpose" claim and are never accepted as access tokens
+MFA_ENROLMENT_PURPOSE = "mfa_enrolment"
+# "idp" claim of access tokens minted from an Azure AD id_token; only these can act as a consultant,
+# identified by their "oid" claim (the Azure object id)
+AZURE_IDP = "azure"
+
+# OAuth2 scheme for token authentication
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
+
+
+class Keyring:
+    def __init__(self, keys: Dict[str, str], active_kid: str):
+        if active_kid not in keys:
+            raise ValueError(f"Active JWT key id '{active_kid}' is not in the keyring")
+        self.keys = keys
+        self.active_kid = active_kid
+
+    @classmethod
+    def from_env(cls) -> "Keyring":
+        keys = {}
+        for entry in filter(None, (part.strip() for part in JWT_SIGNING_KEYS.split(","))):
+            kid, _, secret = entry.partition(":")
+            keys[kid] = secret
+        if not keys:
+            keys = {"default": SECRET_KEY}
+        return cls(keys, JWT_ACTIVE_KID or next(iter(keys)))
+
+    def signing_key(self):
+        return self.active_kid, self.keys[self.active_kid]
+
+    def verification_key(self, kid: Optional[str]) -> str:
+        # Tokens issued before kid headers were added fall back to the active key
+        key = self.keys.get(kid or self.active_kid)
+        if key is None:
+            raise jwt.InvalidTokenError(f"Unknown key id '{kid}'")
+        return key
+
+
+keyring = Keyring.from_env()
+
+
+# Function to create JWT Token
+def create_token(data: dict, expires_delta: timedelta = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)):
+    to_encode = data.copy()
+    to_encode["exp"] = datetime.now(timezone.utc) + expires_delta
+    kid, key = keyring.signing_key()
+    return jwt.encode(to_encode, key, algorithm=ALGORITHM, headers={"kid": kid})
+
+
+def decode_token(token: str) -> Dict[str, Any]:
+    kid = jwt.get_unverified_header(token).get("kid")
+    return jwt.decode(token, keyring.verification_key(kid), algorithms=[ALGORITHM], options={"require": ["exp", "sub"]})
+
+
+class VerifiedTokenCache:
+    """LRU of sha256(token) -> claims for tokens that already passed verification.
+
+    An entry never outlives the token's own `exp`, so a cache hit is exactly as
+    valid as a fresh decode.
+    """
+
+    def __init__(self, max_entries: int = VERIFIED_TOKEN_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token_hash: bytes) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(token_hash)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[token_hash]
+                return None
+            self._entries.move_to_end(token_hash)
+            return entry[1]
+
+    def put(self, token_hash: bytes, claims: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[token_hash] = (float(claims["exp"]), claims)
+            self._entries.move_to_end(token_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+verified_tokens = VerifiedTokenCache()
+
+
+@dataclass
+class Principal:
+    subject: str
+    claims: Dict[str, Any]
+    # Filled from the customer cache only; None when the customer is not cached
+    customer: Optional[CustomerAuth] = None
+
+
+def verify_token(token: str) -> Dict[str, Any]:
+    token_hash = hashlib.sha256(token.encode()).digest()
+    claims = verified_tokens.get(token_hash)
+    if claims is None:
+        claims = decode_token(token)
+        verified_tokens.put(token_hash, claims)
+    return claims
+
+
+def create_enrolment_token(email: str, expires_delta: timedelta) -> str:
+    return create_token({"sub": email, "purpose": MFA_ENROLMENT_PURPOSE}, expires_delta)
+
+
+def verify_enrolment_token(token: str) -> str:
+    """Return the email an MFA enrolment token was issued for."""
+    claims = verify_token(token)
+    if claims.get("purpose") != MFA_ENROLMENT_PURPOSE:
+        raise jwt.InvalidTokenError("Not an MFA enrolment token")
+    return claims["sub"]
+
+
+async def get_current_principal(token: str = Depends(oauth2_scheme)) -> Principal:
+    try:
+        claims = verify_token(token)
+        if "purpose" in claims:
+            raise jwt.InvalidTokenError("Scoped token used as an access token")
+    except jwt.PyJWTError:
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid or expired token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    subject = claims["sub"]
+    return Principal(subject=subject, claims=claims, customer=customer_cache.peek(subject))